@@ -1,3 +1,2 @@
-from .bot import MusicBot
-
-__all__ = ['MusicBot']
+# MusicBot is imported from musicbot.bot, importing the package itself must stay cheap: the meme
+# renderer's process pool workers import musicbot.memes, and with spawn (Windows) that runs this file
@@ -8,10 +8,11 @@ import time
 import traceback
 from collections import defaultdict
 from datetime import timedelta
-from functools import wraps
+from functools import partial, wraps
 from io import BytesIO
-from random import choice, shuffle
+from random import choice, randrange, shuffle
 from textwrap import dedent
+from urllib.parse import urlsplit
 
 import aiohttp
 import discord
@@ -22,23 +23,36 @@ from discord.ext.commands.bot import _get_variable
 from discord.object import Object
 from discord.voice_client import VoiceClient
 
+from musicbot.changelog import ChannelChangelog
+from musicbot.comics import ComicError, ComicPool
 from musicbot.config import Config, ConfigDefaults
-from musicbot.lib.srv import ThreadedServer
+from musicbot.deletion import DeletionService
+from musicbot.giphy import Giphy
+from musicbot.imgur import ImgurCatalog, ImgurError
+from musicbot.lib.cache import TTLCache
+from musicbot.lib.srv import BridgeServer
+from musicbot.lib.timers import TimerHeap
+from musicbot.listeners import ListenerRegistry, MESSAGE, REACTION
+from musicbot.paginator import LazyPages, Paginator
 from musicbot.permissions import Permissions, PermissionsDefaults
-from musicbot.player import MusicPlayer
+from musicbot.player import MusicPlayer, MusicPlayerState
 from musicbot.playlist import Playlist
-from musicbot.utils import load_file, write_file, sane_round_int
+from musicbot.presence import OwnerTracker, PresenceCounters
+from musicbot.utils import load_file, write_file, sane_round_int, paginate
+from musicbot.voicelog import VoiceActivityLog
+from musicbot.weather import WeatherService
+from musicbot.webclient import WebClient, DownloadTooLarge
 
 from . import downloader
 from . import exceptions
 from . import memes
+from . import outbound
 
 from .constants import DISCORD_MSG_CHAR_LIMIT, AUDIO_CACHE_PATH
 from .constants import VERSION as BOTVERSION
 from .opus_loader import load_opus_lib
 
 from .secret import *
-from .lib.srv import ThreadedServer
 
 load_opus_lib()
 
@@ -72,6 +86,7 @@ class Response:
 class MusicBot(discord.Client):
 
 	def __init__(self, config_file=ConfigDefaults.options_file, perms_file=PermissionsDefaults.perms_file):
+		self._event_handlers = {}
 		self.dirname = os.path.dirname(__file__).rsplit('\\', 1)[0]
 		self.players = {}
 		self.the_voice_clients = {}
@@ -85,10 +100,18 @@ class MusicBot(discord.Client):
 		self.blacklist = set(load_file(self.config.blacklist_file))
 		self.autoplaylist = load_file(self.config.auto_playlist_file)
 		self.downloader = downloader.Downloader(download_folder='audio_cache')
+		self.channel_log = ChannelChangelog(lambda: pymysql.connect(
+			host='localhost',
+			port=3306,
+			user='root',
+			passwd=mysql_password,
+			db='discord_channel_backup'
+		))
 
 		self.exit_signal = None
 		self.init_ok = False
 		self.cached_client_id = None
+		self.config_watcher = None
 
 		if not self.autoplaylist:
 			print("Warning: Autoplaylist is empty, disabling.")
@@ -100,8 +123,32 @@ class MusicBot(discord.Client):
 
 		super().__init__()
 		self.aiosession = aiohttp.ClientSession(loop=self.loop)
+		self.web = WebClient(self.aiosession, loop=self.loop)
+		self.weather = WeatherService(self.web, weather_api_key, loop=self.loop)
+		self.imgur = ImgurCatalog(self.web, CLIENT_ID, ACCESS_TOKEN, loop=self.loop)
+		self.imgur_selections = TTLCache(24 * 60 * 60, maxsize=500)
+		self.comics = ComicPool(self.web, loop=self.loop)
+		self.giphy = Giphy(self.web, GIPHY_API_KEY)
+		self.memes = memes.MemeEngine(self.loop)
+		self.bridge = None
+		self.presence = PresenceCounters()
+		self.owner_presence = OwnerTracker(self.config.owner_id)
+		self.active_players = set()
+		self.last_message_ids = {}
+		self._now_playing_request = (None, False)
+		self._now_playing_timer = None
+		self._now_playing_status = None
+		self.outbound = outbound.OutboundScheduler(loop=self.loop)
+		self.timers = TimerHeap(loop=self.loop)
+		self.deleter = DeletionService(self, self.timers, loop=self.loop)
+		self.voice_log = VoiceActivityLog(
+			partial(self.safe_send_message, priority=outbound.BACKGROUND), self.timers, loop=self.loop)
 		self.http.user_agent += ' MusicBot/%s' % BOTVERSION
 
+		# replaces discord.Client's plain list, see wait_for_message and wait_for_reaction below
+		self._listeners = ListenerRegistry()
+		self._filter_stateless_events()
+
 	# TODO: Add some sort of `denied` argument for a message to send when someone else tries to use it
 	def owner_only(func):
 		@wraps(func)
@@ -121,14 +168,7 @@ class MusicBot(discord.Client):
 		return ('{:.%sf}' % dp).format(x).rstrip('0').rstrip('.')
 
 	def _get_owner(self, voice=False):
-		if voice:
-			for server in self.servers:
-				for channel in server.channels:
-					for m in channel.voice_members:
-						if m.id == self.config.owner_id:
-							return m
-		else:
-			return discord.utils.find(lambda m: m.id == self.config.owner_id, self.get_all_members())
+		return self.owner_presence.get(voice)
 
 	def _delete_old_audiocache(self, path=AUDIO_CACHE_PATH):
 		try:
@@ -198,10 +238,6 @@ class MusicBot(discord.Client):
 			else:
 				print("Invalid channel thing: " + channel)
 
-	async def _wait_delete_msg(self, message, after):
-		await asyncio.sleep(after)
-		await self.safe_delete_message(message)
-
 	# TODO: Check to see if I can just move this to on_message after the response check
 	async def _manual_delete_check(self, message, *, quiet=False):
 		if self.config.delete_invoking:
@@ -217,6 +253,89 @@ class MusicBot(discord.Client):
 			raise exceptions.PermissionsError(
 				"you cannot use this command when not in the voice channel (%s)" % vc.name, expire_in=30)
 
+	@staticmethod
+	def _get_mtime(path):
+		try:
+			return os.stat(path).st_mtime
+		except OSError:
+			return None
+
+	@staticmethod
+	def _load_config_files(config_file, perms_file, owner_id):
+		# Runs in an executor, so nothing here should touch the client state
+		config = Config(config_file)
+		permissions = Permissions(perms_file, grant_all=[owner_id])
+		return config, permissions
+
+	async def reload_config(self):
+		"""
+		Re-parses options.ini and permissions.ini off the event loop and swaps them in.
+		The old objects are kept if either file fails to validate.
+		"""
+		try:
+			config, permissions = await self.loop.run_in_executor(
+				None, self._load_config_files,
+				self.config.config_file, self.permissions.config_file, self.config.owner_id)
+
+		except exceptions.HelpfulError as e:
+			print("[Config] Reload failed, keeping the current settings:")
+			print(e.message)
+			return False
+
+		except Exception:
+			print("[Config] Reload failed, keeping the current settings:")
+			traceback.print_exc()
+			return False
+
+		if config.auth != self.config.auth or config.owner_id != self.config.owner_id:
+			print("[Config] Credentials and OwnerID changes only take effect after a restart")
+			config.auth = self.config.auth
+			config.owner_id = self.config.owner_id
+
+		if config.bound_channels:
+			config.bound_channels.difference_update([
+				i for i in config.bound_channels
+				if getattr(self.get_channel(i), 'type', None) == discord.ChannelType.voice])
+
+		if config.blacklist_file != self.config.blacklist_file:
+			self.blacklist = set(load_file(config.blacklist_file))
+
+		if config.auto_playlist_file != self.config.auto_playlist_file:
+			self.autoplaylist = load_file(config.auto_playlist_file)
+
+		if not self.autoplaylist:
+			config.auto_playlist = False
+
+		old_bridge_port = self.config.whatsapp_bridge_port
+
+		self.config = config
+		self.permissions = permissions
+
+		if config.whatsapp_bridge_port != old_bridge_port:
+			if self.bridge:
+				self.bridge.close()
+				self.bridge = None
+
+			# starts it on the new port, unless the bridge was turned off
+			await self.whatsapp()
+
+		print("[Config] Reloaded %s and %s" % (config.config_file, permissions.config_file))
+		return True
+
+	async def _watch_config_files(self, interval=5):
+		watched = lambda: (self.config.config_file, self.permissions.config_file)
+		mtimes = {path: self._get_mtime(path) for path in watched()}
+
+		while not self.is_closed:
+			await asyncio.sleep(interval)
+
+			current = {path: self._get_mtime(path) for path in watched()}
+			if current != mtimes and all(current.values()):
+				await self.reload_config()
+				current = {path: self._get_mtime(path) for path in watched()}
+
+			mtimes = current
+
 	async def generate_invite_link(self, *, permissions=None, server=None):
 		if not self.cached_client_id:
 			appinfo = await self.application_info()
@@ -375,7 +494,8 @@ class MusicBot(discord.Client):
 				.on('pause', self.on_player_pause) \
 				.on('stop', self.on_player_stop) \
 				.on('finished-playing', self.on_player_finished_playing) \
-				.on('entry-added', self.on_player_entry_added)
+				.on('entry-added', self.on_player_entry_added) \
+				.on('state-changed', self.on_player_state_changed)
 
 			player.skip_state = SkipState()
 			self.players[server.id] = player
@@ -393,11 +513,10 @@ class MusicBot(discord.Client):
 			last_np_msg = self.server_specific_data[channel.server]['last_np_msg']
 			if last_np_msg and last_np_msg.channel == channel:
 
-				async for lmsg in self.logs_from(channel, limit=1):
-					if lmsg != last_np_msg and last_np_msg:
-						await self.safe_delete_message(last_np_msg)
-						self.server_specific_data[channel.server]['last_np_msg'] = None
-					break  # This is probably redundant
+				# resend instead of editing when something was posted after it
+				if self.last_message_ids.get(channel.id) != last_np_msg.id:
+					await self.safe_delete_message(last_np_msg)
+					self.server_specific_data[channel.server]['last_np_msg'] = None
 
 			if self.config.now_playing_mentions:
 				newmsg = '%s - your song **%s** is now playing in %s!' % (
@@ -452,18 +571,33 @@ class MusicBot(discord.Client):
 	async def on_player_entry_added(self, playlist, entry, **_):
 		pass
 
+	def on_player_state_changed(self, player, new, **_):
+		# players that are playing right now, so the now playing status doesn't have to count them
+		if new == MusicPlayerState.PLAYING:
+			self.active_players.add(player)
+		else:
+			self.active_players.discard(player)
+
 	async def update_now_playing(self, entry=None, is_paused=False):
+		# bursts of play/pause/stop events across servers end up as at most one status change
+		self._now_playing_request = (entry, is_paused)
+
+		if self._now_playing_timer is None:
+			self._now_playing_timer = self.timers.call_later(1, self._apply_now_playing)
+
+	def _apply_now_playing(self):
+		self._now_playing_timer = None
+		entry, is_paused = self._now_playing_request
 		game = None
 
 		if self.user.bot:
-			activeplayers = sum(1 for p in self.players.values() if p.is_playing)
-			if activeplayers > 1:
-				game = discord.Game(name="music on %s servers" % activeplayers)
+			if len(self.active_players) > 1:
+				game = discord.Game(name="music on %s servers" % len(self.active_players))
 				entry = None
 
-			elif activeplayers == 1:
-				player = discord.utils.get(self.players.values(), is_playing=True)
-				entry = player.current_entry
+			elif len(self.active_players) == 1:
+				entry = next(iter(self.active_players)).current_entry
+				is_paused = False
 
 		if entry:
 			prefix = u'\u275A\u275A ' if is_paused else ''
@@ -471,18 +605,24 @@ class MusicBot(discord.Client):
 			name = u'{}{}'.format(prefix, entry.title)[:128]
 			game = discord.Game(name=name)
 
-		await self.change_status(game)
+		status = game.name if game else None
+		if status != self._now_playing_status:
+			self._now_playing_status = status
+			asyncio.ensure_future(self.change_status(game), loop=self.loop)
 
-	async def safe_send_message(self, dest, content, *, tts=False, expire_in=0, also_delete=None, quiet=False):
+	# sends, edits and deletes go through the outbound scheduler, which paces them per channel
+	async def safe_send_message(self, dest, content, *, tts=False, expire_in=0, also_delete=None, quiet=False,
+								priority=outbound.REPLY):
 		msg = None
 		try:
-			msg = await self.send_message(dest, content, tts=tts)
+			msg = await self.outbound.submit(
+				'send', dest, partial(self.send_message, dest, content, tts=tts), priority=priority)
 
 			if msg and expire_in:
-				asyncio.ensure_future(self._wait_delete_msg(msg, expire_in))
+				self.deleter.delete_later(msg, expire_in)
 
 			if also_delete and isinstance(also_delete, discord.Message):
-				asyncio.ensure_future(self._wait_delete_msg(also_delete, expire_in))
+				self.deleter.delete_later(also_delete, expire_in)
 
 		except discord.Forbidden:
 			if not quiet:
@@ -494,9 +634,13 @@ class MusicBot(discord.Client):
 
 		return msg
 
-	async def safe_delete_message(self, message, *, quiet=False):
+	async def safe_delete_message(self, message, *, quiet=False, priority=outbound.BACKGROUND):
+		self.deleter.cancel(message)
+
 		try:
-			return await self.delete_message(message)
+			return await self.outbound.submit(
+				'delete', message.channel, partial(self.delete_message, message),
+				priority=priority, coalesce_key=message.id)
 
 		except discord.Forbidden:
 			if not quiet:
@@ -506,9 +650,11 @@ class MusicBot(discord.Client):
 			if not quiet:
 				self.safe_print("Warning: Cannot delete message \"%s\", message not found" % message.clean_content)
 
-	async def safe_edit_message(self, message, new, *, send_if_fail=False, quiet=False):
+	async def safe_edit_message(self, message, new, *, send_if_fail=False, quiet=False, priority=outbound.COSMETIC):
 		try:
-			return await self.edit_message(message, new)
+			return await self.outbound.submit(
+				'edit', message.channel, partial(self.edit_message, message, new),
+				priority=priority, coalesce_key=message.id)
 
 		except discord.NotFound:
 			if not quiet:
@@ -518,6 +664,16 @@ class MusicBot(discord.Client):
 					print("Sending instead")
 				return await self.safe_send_message(message.channel, new)
 
+	async def send_remote_file(self, dest, url, *, filename=None, content=None):
+		"""
+		Streams a remote file into memory and uploads it, without going through the disk.
+		"""
+		if filename is None:
+			filename = os.path.basename(urlsplit(url).path) or 'file'
+
+		with await self.web.download(url) as fp:
+			return await self.send_file(dest, fp, filename=filename, content=content)
+
 	def safe_print(self, content, *, end='\n', flush=True):
 		sys.stdout.buffer.write((content + end).encode('utf-8', 'replace'))
 		if flush: sys.stdout.flush()
@@ -541,6 +697,18 @@ class MusicBot(discord.Client):
 		except: # Can be ignored
 			pass
 
+		self.memes.close()
+		self.channel_log.close()
+
+		# pending expirations are picked up again in on_ready
+		try:
+			self.deleter.save(ConfigDefaults.expiring_messages_file)
+		except OSError:
+			traceback.print_exc()
+
+		if self.bridge:
+			self.bridge.close()
+
 		pending = asyncio.Task.all_tasks()
 		gathered = asyncio.gather(*pending)
 
@@ -594,6 +762,123 @@ class MusicBot(discord.Client):
 		else:
 			traceback.print_exc()
 
+	# parsers of gateway events that only dispatch and never touch the cache,
+	# so they can be skipped while nothing handles the event
+	_stateless_parsers = {
+		'typing': 'parse_typing_start',
+	}
+
+	def _filter_stateless_events(self):
+		for event, parser in self._stateless_parsers.items():
+			original = getattr(self.connection, parser, None)
+			if original is None:
+				continue
+
+			def filtered(data, *, event=event, original=original):
+				if self.has_subscriber(event):
+					original(data)
+
+			setattr(self.connection, parser, filtered)
+
+	def __setattr__(self, name, value):
+		# handlers added later, e.g. through event(), have to be picked up by dispatch
+		if name.startswith(('on_', 'handle_')):
+			self.__dict__.get('_event_handlers', {}).clear()
+
+		super().__setattr__(name, value)
+
+	def _resolve_handlers(self, event):
+		try:
+			return self._event_handlers[event]
+		except KeyError:
+			pass
+
+		handler = getattr(self, 'handle_' + event, None)
+		method = 'on_' + event
+		if not hasattr(self, method):
+			method = None
+
+		resolved = self._event_handlers[event] = (handler, method)
+		return resolved
+
+	def has_subscriber(self, event):
+		handler, method = self._resolve_handlers(event)
+		return handler is not None or method is not None
+
+	def dispatch(self, event, *args, **kwargs):
+		# same as discord.Client.dispatch without building the handler names and looking them up every event
+		handler, method = self._resolve_handlers(event)
+
+		if handler is not None:
+			handler(*args, **kwargs)
+
+		if method is not None:
+			asyncio.ensure_future(self._run_event(method, *args, **kwargs), loop=self.loop)
+
+	# wait_for_message and wait_for_reaction work like discord.Client's, but their listeners are
+	# kept in a ListenerRegistry so a message or reaction doesn't run every pending check
+	def handle_message(self, message):
+		self._listeners.dispatch(MESSAGE, message.channel.id, message.author.id, (message,), message)
+
+	def handle_reaction_add(self, reaction, user):
+		self._listeners.dispatch(REACTION, reaction.message.id, user.id,
+								 (reaction, user), discord.client.WaitedReaction(reaction, user))
+
+	async def wait_for_message(self, timeout=None, *, author=None, channel=None, content=None, check=None):
+		def predicate(message):
+			result = True
+			if author is not None:
+				result = result and message.author == author
+
+			if content is not None:
+				result = result and message.content == content
+
+			if channel is not None:
+				result = result and message.channel.id == channel.id
+
+			if callable(check):
+				result = result and check(message)
+
+			return result
+
+		future = asyncio.Future(loop=self.loop)
+		self._listeners.add(MESSAGE, (getattr(channel, 'id', None), getattr(author, 'id', None)), predicate, future)
+
+		try:
+			return await asyncio.wait_for(future, timeout)
+		except asyncio.TimeoutError:
+			return None
+
+	async def wait_for_reaction(self, emoji=None, *, user=None, timeout=None, message=None, check=None):
+		if emoji is None:
+			emoji_check = lambda r: True
+		elif isinstance(emoji, (str, discord.Emoji)):
+			emoji_check = lambda r: r.emoji == emoji
+		else:
+			emoji_check = lambda r: r.emoji in emoji
+
+		def predicate(reaction, reaction_user):
+			result = emoji_check(reaction)
+
+			if message is not None:
+				result = result and message.id == reaction.message.id
+
+			if user is not None:
+				result = result and user.id == reaction_user.id
+
+			if callable(check):
+				result = result and check(reaction, reaction_user)
+
+			return result
+
+		future = asyncio.Future(loop=self.loop)
+		self._listeners.add(REACTION, (getattr(message, 'id', None), getattr(user, 'id', None)), predicate, future)
+
+		try:
+			return await asyncio.wait_for(future, timeout)
+		except asyncio.TimeoutError:
+			return None
+
 	async def on_resumed(self):
 		for vc in self.the_voice_clients.values():
 			vc.main_ws = self.ws
@@ -601,6 +886,22 @@ class MusicBot(discord.Client):
 	async def on_ready(self):
 		self.loop.create_task(self.whatsapp())
 
+		if not self.config_watcher:
+			self.config_watcher = self.loop.create_task(self._watch_config_files())
+
+		self.comics.start()
+		self.presence.rebuild_all(self.servers)
+		self.owner_presence.rebuild(self.servers)
+		self.voice_log.index_all(self.servers)
+		for server in self.servers:
+			self.channel_log.reconcile(server)
+		self.deleter.load(ConfigDefaults.expiring_messages_file)
+
+		# a new session starts without a status
+		self._now_playing_status = None
+		if self.active_players:
+			await self.update_now_playing()
+
 		print('\rConnected!  Musicbot v%s\n' % BOTVERSION)
 
 		if self.config.owner_id == self.user.id:
@@ -976,7 +1277,7 @@ class MusicBot(discord.Client):
 			if permissions.max_song_length:
 				for e in entry_list.copy():
 					if e.duration > permissions.max_song_length:
-						player.playlist.entries.remove(e)
+						player.playlist.remove_entry(e)
 						entry_list.remove(e)
 						drop_count += 1
 						# Im pretty sure there's no situation where this would ever break
@@ -1092,7 +1393,7 @@ class MusicBot(discord.Client):
 			for e in entries_added.copy():
 				if e.duration > permissions.max_song_length:
 					try:
-						player.playlist.entries.remove(e)
+						player.playlist.remove_entry(e)
 						entries_added.remove(e)
 						drop_count += 1
 					except:
@@ -1224,47 +1525,18 @@ class MusicBot(discord.Client):
 		if not info:
 			return Response("No videos found.", delete_after=30)
 
-		def check(m):
-			return (
-				m.content.lower()[0] in 'yn' or
-				# hardcoded function name weeee
-				m.content.lower().startswith('{}{}'.format(self.config.command_prefix, 'search')) or
-				m.content.lower().startswith('exit'))
-
-		for e in info['entries']:
-			result_message = await self.safe_send_message(channel, "Result %s/%s: %s" % (
-				info['entries'].index(e) + 1, len(info['entries']), e['webpage_url']))
-
-			confirm_message = await self.safe_send_message(channel, "Is this ok? Type `y`, `n` or `exit`")
-			response_message = await self.wait_for_message(30, author=author, channel=channel, check=check)
-
-			if not response_message:
-				await self.safe_delete_message(result_message)
-				await self.safe_delete_message(confirm_message)
-				return Response("Ok nevermind.", delete_after=30)
+		entries = info['entries']
+		pages = ["Result {}/{}: {}\n\nClick \u2705 to queue it.".format(i, len(entries), e['webpage_url'])
+				 for i, e in enumerate(entries, 1)]
 
-			# They started a new search query so lets clean up and bugger off
-			elif response_message.content.startswith(self.config.command_prefix) or \
-					response_message.content.lower().startswith('exit'):
+		selected = await Paginator(self, channel, author, pages, confirm=True, timeout=30).run()
 
-				await self.safe_delete_message(result_message)
-				await self.safe_delete_message(confirm_message)
-				return
-
-			if response_message.content.lower().startswith('y'):
-				await self.safe_delete_message(result_message)
-				await self.safe_delete_message(confirm_message)
-				await self.safe_delete_message(response_message)
+		if selected is None:
+			return Response("Ok nevermind.", delete_after=30)
 
-				await self.cmd_play(player, channel, author, permissions, [], e['webpage_url'])
-
-				return Response("Alright, coming right up!", delete_after=30)
-			else:
-				await self.safe_delete_message(result_message)
-				await self.safe_delete_message(confirm_message)
-				await self.safe_delete_message(response_message)
+		await self.cmd_play(player, channel, author, permissions, [], entries[selected]['webpage_url'])
 
-		return Response("Oh well :frowning:", delete_after=30)
+		return Response("Alright, coming right up!", delete_after=30)
 
 	async def cmd_np(self, player, channel, server, message):
 		"""
@@ -1511,17 +1783,32 @@ class MusicBot(discord.Client):
 				raise exceptions.CommandError(
 					'Unreasonable volume provided: {}%. Provide a value between 1 and 100.'.format(new_volume), expire_in=20)
 
-	async def cmd_queue(self, channel, player):
+	async def cmd_queue(self, channel, author, player, page=None):
 		"""
 		Usage:
-			{command_prefix}queue
+			{command_prefix}queue [page]
 
-		Prints the current song queue.
+		Prints the current song queue, 10 songs per page.
+		Without a page number longer queues can be browsed with reactions.
 		"""
 
+		if page is not None:
+			try:
+				page = int(page)
+			except ValueError:
+				raise exceptions.CommandError('{} is not a valid page number.'.format(page), expire_in=20)
+
+		elif player.playlist.page_count() > 1:
+			pages = LazyPages(player.playlist.page_count(), lambda index: self._queue_message(player, index + 1))
+			await Paginator(self, channel, author, pages, page_footer=False, timeout=60).run()
+			return
+
+		return Response(self._queue_message(player, page or 1), delete_after=30)
+
+	def _queue_message(self, player, page):
+		playlist = player.playlist
+		page = min(max(page, 1), playlist.page_count())
 		lines = []
-		unlisted = 0
-		andmoretext = '* ... and %s more*' % ('x' * len(player.playlist.entries))
 
 		if player.current_entry:
 			song_progress = str(timedelta(seconds=player.progress)).lstrip('0').lstrip(':')
@@ -1534,30 +1821,47 @@ class MusicBot(discord.Client):
 			else:
 				lines.append("Now Playing: **%s** %s\n" % (player.current_entry.title, prog_str))
 
-		for i, item in enumerate(player.playlist, 1):
-			if item.meta.get('channel', False) and item.meta.get('author', False):
-				nextline = '`{}.` **{}** added by **{}**'.format(i, item.title, item.meta['author'].name).strip()
-			else:
-				nextline = '`{}.` **{}**'.format(i, item.title).strip()
-
-			currentlinesum = sum(len(x) + 1 for x in lines)  # +1 is for newline char
+		if playlist.entries:
+			# pages are rendered once and kept until the playlist changes
+			if page not in playlist.page_cache:
+				playlist.page_cache[page] = self._render_queue_page(playlist, page)
 
-			if currentlinesum + len(nextline) + len(andmoretext) > DISCORD_MSG_CHAR_LIMIT:
-				if currentlinesum + len(andmoretext):
-					unlisted += 1
-					continue
-
-			lines.append(nextline)
-
-		if unlisted:
-			lines.append('\n*... and %s more*' % unlisted)
+			lines.append(playlist.page_cache[page])
 
 		if not lines:
 			lines.append(
 				'There are no songs queued! Queue something with {}play.'.format(self.config.command_prefix))
 
-		message = '\n'.join(lines)
-		return Response(message, delete_after=30)
+		return '\n'.join(lines)
+
+	@staticmethod
+	def _render_queue_page(playlist, page):
+		entries, position = playlist.page(page)
+
+		footer = '\n*Page {}/{} - {} songs, {} total*'.format(
+			page, playlist.page_count(), len(playlist.entries), timedelta(seconds=int(playlist.duration)))
+
+		# leave room for the now playing line
+		budget = DISCORD_MSG_CHAR_LIMIT - len(footer) - 400
+		lines = []
+		length = 0
+
+		for i, item in enumerate(entries, position):
+			title = item.title if len(item.title) <= 80 else item.title[:79] + '…'
+
+			if item.meta.get('channel', False) and item.meta.get('author', False):
+				nextline = '`{}.` **{}** added by **{}**'.format(i, title, item.meta['author'].name).strip()
+			else:
+				nextline = '`{}.` **{}**'.format(i, title).strip()
+
+			length += len(nextline) + 1  # +1 is for newline char
+			if length > budget:
+				break
+
+			lines.append(nextline)
+
+		lines.append(footer)
+		return '\n'.join(lines)
 
 	async def cmd_clean(self, message, channel, server, author, search_range=50):
 		"""
@@ -1593,27 +1897,16 @@ class MusicBot(discord.Client):
 				deleted = await self.purge_from(channel, check=check, limit=search_range, before=message)
 				return Response('Cleaned up {} message{}.'.format(len(deleted), 's' * bool(deleted)), delete_after=15)
 
-		deleted = 0
+		to_delete = []
 		async for entry in self.logs_from(channel, search_range, before=message):
 			if entry == self.server_specific_data[channel.server]['last_np_msg']:
 				continue
 
-			if entry.author == self.user:
-				await self.safe_delete_message(entry)
-				deleted += 1
-				await asyncio.sleep(0.21)
-
-			if is_possible_command_invoke(entry) and delete_invokes:
-				if delete_all or entry.author == author:
-					try:
-						await self.delete_message(entry)
-						await asyncio.sleep(0.21)
-						deleted += 1
+			if entry.author == self.user or (is_possible_command_invoke(entry) and (delete_all or entry.author == author)):
+				to_delete.append(entry)
 
-					except discord.Forbidden:
-						delete_invokes = False
-					except discord.HTTPException:
-						pass
+		# bulk deleted where allowed, otherwise paced one by one by the outbound scheduler
+		deleted = await self.deleter.delete_many(to_delete)
 
 		return Response('Cleaned up {} message{}.'.format(deleted, 's' * bool(deleted)), delete_after=15)
 
@@ -1710,6 +2003,15 @@ class MusicBot(discord.Client):
 			if rawudata:
 				data.extend(rawudata)
 
+		pages = paginate(['```'] + data + ['```'])
+
+		# a few messages are easier to read, big servers get a file instead
+		if len(pages) <= 3:
+			for page in pages:
+				await self.safe_send_message(author, page)
+
+			return Response(":mailbox_with_mail:", delete_after=20)
+
 		with BytesIO() as sdata:
 			sdata.writelines(d.encode('utf8') + b'\n' for d in data)
 			sdata.seek(0)
@@ -1736,7 +2038,8 @@ class MusicBot(discord.Client):
 
 			lines.insert(len(lines) - 1, "%s: %s" % (perm, permissions.__dict__[perm]))
 
-		await self.send_message(author, '\n'.join(lines))
+		for page in paginate(lines):
+			await self.safe_send_message(author, page)
 		return Response(":mailbox_with_mail:", delete_after=20)
 
 
@@ -1806,6 +2109,21 @@ class MusicBot(discord.Client):
 		return Response(":ok_hand:", delete_after=20)
 
 
+	@owner_only
+	async def cmd_reload(self):
+		"""
+		Usage:
+			{command_prefix}reload
+
+		Reloads options.ini and permissions.ini without restarting the bot.
+		The files are also reloaded automatically a few seconds after they are saved.
+		"""
+
+		if await self.reload_config():
+			return Response(":ok_hand:", delete_after=20)
+
+		raise exceptions.CommandError("Could not reload the config, check the console for details.", expire_in=20)
+
 	async def cmd_disconnect(self, server):
 		await self.disconnect_voice_client(server)
 		return Response(":hear_no_evil:", delete_after=20)
@@ -1821,6 +2139,9 @@ class MusicBot(discord.Client):
 		raise exceptions.TerminateSignal
 
 	async def on_message(self, message):
+		# newest message of every channel, so on_player_play can tell if the now playing message got buried
+		self.last_message_ids[message.channel.id] = message.id
+
 		await self.wait_until_ready()
 
 		message_content = message.content.strip()
@@ -1987,6 +2308,8 @@ class MusicBot(discord.Client):
 				await self.safe_send_message(message.channel, '```\n%s\n```' % traceback.format_exc())
 
 	async def on_voice_state_update(self, before, after):
+		self.presence.update(after)
+		self.owner_presence.update(after)
 
 		# logging user movement
 
@@ -1994,31 +2317,20 @@ class MusicBot(discord.Client):
 
 		current_time = datetime.now().strftime("%H:%M %Y-%m-%d ")
 
-		channel_names = []
-		server_selection = None
-		for channel in after.server.channels:
-			channel_names.append(channel.name)
-
-		if "logs" not in channel_names:
-			return print("There was a voice activity in {} but there was no logs channel found.".format(after.server.name))
-		else:
-			for channel in after.server.channels:
-				if channel.name == "logs":
-					server_selection = channel
+		# voice state is triggered when user mutes but doesn't change channels, don't display that
+		if before.voice_channel == after.voice_channel:
+			return
 
 		if before.voice_channel is None:
-			await self.safe_send_message(server_selection,
-										 "```nginx\n{} joined {} at {} (California Time)\n```".format(after.name, after.voice_channel, current_time))
+			line = "{} joined {} at {} (California Time)".format(after.name, after.voice_channel, current_time)
 		elif after.voice_channel is None:
-			await self.safe_send_message(server_selection, "```nginx\n{} disconnected from {} at {} (California Time)\n```"
-										 .format(after.name, before.voice_channel, current_time))
-		# voice state is triggered when user mutes but doesn't change channels, don't display that
-
-		elif before.voice_channel == after.voice_channel:
-			return
+			line = "{} disconnected from {} at {} (California Time)".format(after.name, before.voice_channel, current_time)
 		else:
-			await self.safe_send_message(server_selection,
-										 "```nginx\n{} switched from {} to {} at {} (California Time)\n```".format(after.name, before.voice_channel, after.voice_channel, current_time))
+			line = "{} switched from {} to {} at {} (California Time)".format(after.name, before.voice_channel, after.voice_channel, current_time)
+
+		# lines are batched and posted every few seconds, see VoiceActivityLog
+		if not self.voice_log.log(after.server, line):
+			print("There was a voice activity in {} but there was no logs channel found.".format(after.server.name))
 
 		print("{} joined {} at {} my time".format(after.name, after.voice_channel, current_time))
 
@@ -2070,55 +2382,70 @@ class MusicBot(discord.Client):
 			self.safe_print("[Servers] \"%s\" changed regions: %s -> %s" % (after.name, before.region, after.region))
 
 			await self.reconnect_voice_client(after)
-	#  here's where we would be putting the code that backs up the server after every update
+
+	async def on_message_delete(self, message):
+		self.deleter.cancel(message)
+
+		# the one before it isn't known, so the channel's newest message is unknown until the next one
+		if self.last_message_ids.get(message.channel.id) == message.id:
+			del self.last_message_ids[message.channel.id]
+
+	async def on_server_join(self, server):
+		self.presence.rebuild(server)
+		self.owner_presence.add_server(server)
+		self.voice_log.index(server)
+		self.channel_log.reconcile(server)
+
+	async def on_server_remove(self, server):
+		self.presence.remove_server(server)
+		self.owner_presence.remove_server(server)
+
+	async def on_member_join(self, member):
+		self.presence.update(member)
+		self.owner_presence.update(member)
+
+	async def on_member_remove(self, member):
+		self.presence.remove_member(member)
+		self.owner_presence.remove_member(member)
+
+	async def on_member_update(self, before, after):
+		self.presence.update(after)
+		self.owner_presence.update(after)
+
+	# channel backups are kept as a changelog of deltas, see ChannelChangelog
+	async def on_channel_create(self, channel):
+		self.channel_log.record('create', channel)
+		self.voice_log.channel_changed(channel)
+
+	async def on_channel_delete(self, channel):
+		self.channel_log.record('delete', channel)
+		self.voice_log.channel_changed(channel)
+
+	async def on_channel_update(self, before, after):
+		self.voice_log.channel_changed(after)
+
+		if before.name != after.name:
+			self.channel_log.record('rename', after)
+		elif before.position != after.position:
+			self.channel_log.record('move', after)
 
 ####################################
 # My Commands ######################
 ####################################
 
 	async def cmd_weather(self, channel, author, city_name, leftover_args):
-		import json
-		import requests
 		from datetime import datetime
 		contact_message = await self.safe_send_message(channel, "Contacting OpenWeatherMap...")
 
-		city_name_url = "http://api.openweathermap.org/data/2.5/weather?q="
-		units = "&units=metric"
 		if not city_name:
 			return Response('Please enter a city after {}weather'.format(self.config.command_prefix), delete_after=20)
 		city = ' '.join([city_name, *leftover_args])
 		print((city))
-		urlrequest = city_name_url + city + units + weather_api_key
-		response = requests.get(urlrequest)
-		data = json.loads(response.text)
-		print(data)
-		if data['cod'] == '404':
+		data, forecast = await self.weather.lookup(city)
+		if forecast is None:
 			await self.safe_delete_message(contact_message)
 			return await self.safe_send_message(channel, "Could not find a city named {}.".format(city))
 
-		cityID = data['id']
-		#  getting forecast data
-		forecast_url = "http://api.openweathermap.org/data/2.5/forecast?id="
-
-		forecast_request = forecast_url + str(cityID) + units + weather_api_key
-		forecast_response = requests.get(forecast_request)
-		forecast = json.loads(forecast_response.text)
-
-		date_array = []
-		forecast_array = []
-		temperature_array = []
-		dates = [y['dt'] for y in forecast['list']]
-		days = dates[::8]
-		for i in range(len(days)):
-			date_array.append(datetime.fromtimestamp(float(days[i])).strftime('%m/%d/%Y'))
-
-		for d in forecast['list']:
-			for k, v in d.items():
-				if v in days:
-					print(d)
-					forecast_array.append(d['weather'][0]['description'])
-					temperature_array.append(d['main']['temp'])
-
 		country = data['sys']['country']
 
 		weather_embed = discord.Embed(
@@ -2134,9 +2461,9 @@ class MusicBot(discord.Client):
 		weather_embed.add_field(name='Weather Description', value=data['weather'][0]['description'].title(), inline=True)
 		weather_embed.add_field(name='Humidity', value="{} %".format(main['humidity']), inline=True)
 		weather_embed.add_field(name='Pressure', value="{} kPa".format(main['pressure']/10), inline=True)
-		for i in range(len(forecast_array)):
-			weather_embed.add_field(name="Forecast for {}".format(date_array[i]), value="{}\n{} °C"
-									.format(forecast_array[i].title(), temperature_array[i]), inline=True)
+		for date, description, temperature in forecast:
+			weather_embed.add_field(name="Forecast for {}".format(date), value="{}\n{} °C"
+									.format(description.title(), temperature), inline=True)
 
 		await discord.Client.send_message(self, destination=channel, embed=weather_embed)
 		await self.safe_delete_message(contact_message)
@@ -2421,11 +2748,7 @@ class MusicBot(discord.Client):
 		fread = open(address, 'r')
 		lines = fread.readlines()
 
-		fread = open(address)
-		for i, line in enumerate(fread):
-			if i == 17:
-				current_map_message = await self.safe_send_message(channel, "Current Map: " + line.split("=")[1]+ "\n\n", expire_in=20)
-		fread.close()
+		current_map = lines[17].split("=")[1].strip()
 
 		# adds all folder names to list
 		location = next(os.walk(path))[1]
@@ -2446,33 +2769,14 @@ class MusicBot(discord.Client):
 		location.remove('.git')
 
 
-		format = ('\n'.join('{}: {}'.format(*k) for k in enumerate(location)))
+		selected = await Paginator.choose(
+			self, channel, author, location,
+			header="Current Map: {}\n\nExisting worlds:".format(current_map), timeout=20).run()
 
-		existing_worlds = await self.safe_send_message(channel, "Existing worlds:" + "\n\n" + format + "\n", expire_in=20)
-		select_world = await self.safe_send_message(channel, "Select a number corresponding to a world." + "\n\n", expire_in=20)
-		selection = await self.wait_for_message(20, author=author, channel=channel)
-
-		if not selection:
+		if selected is None:
 			return Response("Nevermind.", delete_after=20)
-		try:
-			if selection.content:
-				if selection.content.isdigit():
-					global world
-					world = location[int(selection.content)]
-				else:
-					# another !command is given as response
-					if selection.content.startswith(self.config.command_prefix):
-						await self.safe_delete_message(existing_worlds)
-						await self.safe_delete_message(select_world)
-						await self.safe_delete_message(current_map_message)
-						return
-					else:
-						world = str(selection.content)
-			if selection.content.isnumeric() == False:
-				raise exceptions.HelpfulError("You did not enter a number, exiting", "Please enter a number that corresponds with the map.")
-				pass
-		except Exception as e:
-			pass
+
+		world = location[selected]
 
 		with open(address, 'w') as f:
 			for i, line in enumerate(lines):
@@ -2482,226 +2786,89 @@ class MusicBot(discord.Client):
 					print(line)
 					continue
 				f.write(line)
-		if selection:
-			await self.safe_send_message(channel, "Map successfully changed to: " + world +
-										 "\n\n" + "Restart server using !server.", expire_in= 60)
-			await self.safe_delete_message(existing_worlds)
-			await self.safe_delete_message(select_world)
-			await self.safe_delete_message(selection)
-			print("Map changed to" + world + " by " + str(author))
+		await self.safe_send_message(channel, "Map successfully changed to: " + world +
+									 "\n\n" + "Restart server using !server.", expire_in= 60)
+		print("Map changed to" + world + " by " + str(author))
 
 
-	# global variable that changes for !again command
-	perm_link_list = {}
 ############################### IMGUR ####################################
-	async def imgur_search_mode(self, array, iterator, channel, existingauthor):
-		from urllib.request import urlopen
-		import os
-
-		# pretty stupid to get existingauthor as a parameter from the previous method since author is the same..
-		iterated = array[iterator]
-
-		await self.safe_send_message(channel, "Picture # : [" + str(iterator+1) + '/' + str(len(array)) + '] @ ' +
-									 self.perm_link_list[str(existingauthor)]['title'])
-
-# TODO: Make a single method that takes the extension as an argument, move picture identifier inside method to
-# TODO: minimize the time difference between sending the text and the picture so ppl don't type between the msgs
-
-		if str(iterated).endswith('.jpg'):
-			with urlopen(iterated) as URL:
-				with open('temp.jpg', 'wb') as f:
-					f.write(URL.read())
-					await discord.Client.send_file(self, channel, self.dirname + '\\temp.jpg')
-					f.close()
-					os.remove('temp.jpg')
-		elif str(iterated).endswith('.gif'):
-			with urlopen(iterated) as URL:
-				with open('temp.gif', 'wb') as f:
-					f.write(URL.read())
-					await discord.Client.send_file(self, channel, self.dirname + '\\temp.gif')
-					f.close()
-					os.remove('temp.gif')
-		elif str(iterated).endswith('.png'):
-			with urlopen(iterated) as URL:
-				with open('temp.png', 'wb') as f:
-					f.write(URL.read())
-					await discord.Client.send_file(self, channel, self.dirname + '\\temp.png')
-					f.close()
-					os.remove('temp.png')
+	async def imgur_search_mode(self, links, channel, title):
+		index = randrange(len(links))
+		image = links[index]
 
+		await self.safe_send_message(channel, "Picture # : [" + str(index+1) + '/' + str(len(links)) + '] @ ' + title)
 
-	async def cmd_imgur(self, author, channel, server):
-		import requests
-		import json
-		import random
+		if str(image).endswith(('.jpg', '.gif', '.png')):
+			try:
+				await self.send_remote_file(channel, image)
+			except DownloadTooLarge:
+				await self.safe_send_message(channel, "That picture is too big to upload, here's the link instead: " + image)
 
-		print(channel.id)
-		print ('311565508652564490')
-		header = {'authorization': 'Client-ID ' + CLIENT_ID}
-		auth_header = {'authorization': 'Bearer ' + ACCESS_TOKEN}
 
+	async def cmd_imgur(self, author, channel, server):
 		# don't let people post in lobby
 		if channel.id == '311565508652564490':
 			await self.safe_send_message(channel, "This command is not allowed in Lobby.", expire_in=15)
 			return
 
 		# Searches for the album
-		r = requests.get('https://api.imgur.com/3/account/DiscordPictureWizard/albums/', headers=auth_header)
 		try:
-			albumparse = json.loads(r.text)
-		except json.decoder.JSONDecodeError as e :
-			await self.safe_send_message(channel, "Error accessing Imgur API.")
-			print(e)
-			return
-
-		# successfully queried the API?
-		data = albumparse["data"]
-		if albumparse['success'] == True:
-			pass
-		else:
+			data = await self.imgur.albums()
+		except ImgurError as e:
 			await self.safe_send_message(channel, "ERROR: There was a problem accessing the album information "
-					"on Imgur \n\nCopying JSON response:")
-			print(albumparse)
-			await self.safe_send_message(channel, str(albumparse['data']['error']))
+					"on Imgur \n\n{}".format(e))
 			return
 
-		albums_title = []
-		albums_identifier = []
-		albums_id = []
-
-
-
 		# checking if there are any albums in imgur, there will always be one so it's kinda useless
-		if albumparse['data'] == False:
+		if not data:
 			await self.safe_send_message(channel, "No albums found.")
 			return
 
-		# deleting the previous entry for the author and creating a new one. Maybe a replace function exists?
-		if str(author) in self.perm_link_list:
-			del self.perm_link_list[str(author)]
-		self.perm_link_list[str(author)] = {}
-		all_lines = []
-
-		album_header_message = await self.safe_send_message(channel, "\n" + "Albums found for " + str(author.name) + ":")
-
-		# printing the title and the number corresponding to the albums
-		for identifier, title in enumerate(d['title'] for d in data):
-			albums_title.append(title)
-			albums_identifier.append(identifier+1)
-			all_lines.append(str(identifier+1) + ": " + title)
-
-		# prints all found items one under each other to avoid spamming the chat and getting flood protection'd
-		formatted = ("\n".join(map(str, all_lines)))
-
-		album_message = await discord.Client.send_message(self, channel, formatted)
+		selected = await Paginator.choose(
+			self, channel, author, [album['title'] for album in data],
+			header="Albums found for {}:".format(author.name), timeout=20).run()
 
+		# user doesn't pick anything
+		if selected is None:
+			await self.safe_send_message(channel, "Oh well.", expire_in=20)
+			return
 
-		for i in albumparse['data']:
-			for k, v in i.items():
-				if k == 'id':
-					albums_id.append(v)
+		album = data[selected]
 
-		album_selection = await self.wait_for_message(20, author=author, channel=channel)
+		# is album nsfw? don't allow NSFW in non-NSFW channels
+		if channel.name != "nsfw" and album.get('description') == 'nsfw':
+			return Response("NSFW albums can only be posted on NSFW channels.", delete_after=20)
 
-		# user doesn't type anyting
-		if not album_selection or type(album_selection) == None:
-			await self.safe_send_message(channel, "Oh well.", expire_in=20)
-			await self.safe_delete_message(album_message)
-			await self.safe_delete_message(album_header_message)
+		try:
+			image_data = await self.imgur.images(album['id'])
+		except ImgurError as e:
+			await self.safe_send_message(channel, "ERROR: {}".format(e))
 			return
 
-		# user started a new search because they have autism or something so clean up and exit function
-		if album_selection.content.startswith(self.config.command_prefix):
-			await self.safe_delete_message(album_message)
-			await self.safe_delete_message(album_header_message)
-			return
+		link_list = [image['link'] for image in image_data if 'link' in image]
 
-		# is album nsfw? don't allow NSFW in non-NSFW channels
-		if channel.name != "nsfw":
-			# go through ALL dictionaries in 'data': [list]
-			for i in albumparse['data']:
-				# is the title of the album selected in the specific dictionary we're iterating?
-				for k,v in i.items():
-					if v == albums_title[int(album_selection.content)-1]:
-						# if so, look over all the keys to find description, iterate over entire i again to check:
-						for k, v in i.items():
-							if k == 'description' and v == 'nsfw':
-								await self.safe_delete_message(album_message)
-								await self.safe_delete_message(album_header_message)
-								return Response("NSFW albums can only be posted on NSFW channels.", delete_after=20)
-
-
-		# setting the album name in {author: {'title': title ... }
-		# since the order of the loop doesn't change, we don't have to match up selections with our data.
-		# our data[our_selection -1(since the array we're displaying on discord starts at 1, not 0)]
-		# will always give us the right album
-		self.perm_link_list[str(author)]['title'] = albums_title[int(album_selection.content) - 1]
-
-
-		image_information = requests.get('https://api.imgur.com/3/album/'+ albums_id[int(album_selection.content)-1] +'/images', headers=header)
-		image_info_json = json.loads(image_information.text)
-		image_data = image_info_json['data']
-
-		link_list = []
-		response_titles = []
-
-		# finding link name of pictures in reply
-		for i in image_data:
-			for k, v in i.items():
-				if k == 'link':
-					if 'links' not in self.perm_link_list:
-						# leaving this none otherwise appending a list onto an empty list creates double list
-						self.perm_link_list[str(author)]['links'] = None
-					link_list.append(v)
-
-		self.perm_link_list[str(author)]['links'] = link_list
-
-		# finding titles of pictures and links in reply
-		for i in image_data:
-			for k, v in i.items():
-				if k == 'title':
-					response_titles.append(v)
-
-		# selecting random picture from album using randrange, randint isn't inclusive
-		image_choice = random.randrange(0, len(link_list), 1)
-
-		await self.safe_delete_message(album_selection)
-		await self.safe_delete_message(album_message)
-		if album_header_message:
-			await self.safe_delete_message(album_header_message)
-		await self.imgur_search_mode(link_list, image_choice, channel, author)
+		if not link_list:
+			return Response("That album is empty.", delete_after=20)
+
+		# remembered so !again can pick another picture without asking imgur again
+		self.imgur_selections.set(author.id, (album['title'], link_list))
+		await self.imgur_search_mode(link_list, channel, album['title'])
 
 
 	async def cmd_again(self, channel, author):
-		import random
 		# no images in lobby
 		if channel.name == 'lobby':
 			await self.safe_send_message(channel, "This command is not allowed in Lobby.")
 			return
 
-		# no one has used !imgur before?
-		if not self.perm_link_list:
-			return Response("Must use !imgur command before posting another random pic from the same album", delete_after=20)
-
-		# has user previously used !again?
-		if str(author) in self.perm_link_list:
-			try:
-				# browsing keys in dict
-				for k, v in self.perm_link_list[str(author)].items():
-					if k == "links":
-						new_link_list = v
-						image_choice = random.randrange(0, len(new_link_list),1)
-						print("iterator:" +  str(image_choice))
-						await self.imgur_search_mode(new_link_list, image_choice, channel, author)
-			# somehow list gets created without links being added
-			except KeyError:
-				await self.safe_send_message(channel, "ERROR: Debug: !imgur did not put in 'links' key in perm_link_list"
-					 "while creating list.")
-				return
-		else:
+		selection = self.imgur_selections.get(author.id)
+		if not selection:
 			return Response("!again sends a random picture from an imgur album previously selected by"
-							" the specific user of the command. Someone has used '!imgur' before, but it"
-							" wasn't you.", delete_after=20)
+							" the specific user of the command. Use '!imgur' to pick an album first.", delete_after=20)
+
+		title, links = selection
+		await self.imgur_search_mode(links, channel, title)
+
 	async def cmd_download(self):
 		"""
 		Usage:
@@ -2716,33 +2883,17 @@ class MusicBot(discord.Client):
 			!ch
 		Sends a random cyanide and happiness comic.
 		"""
-		from bs4 import BeautifulSoup
-		import requests
-		import random
-		from urllib.request import urlopen
-
-		while True:
-			number = random.randrange(0, 4811)
-			r = requests.get("http://explosm.net/comics/{}/".format(number))
-			if r.text == "Could not find comic":
-				continue
-			else:
-				break
-
-		soup = BeautifulSoup(r.text, "html.parser")
-		imgs = soup.find("img", {"id": "main-comic"})
-
-		link = imgs['src']
-		ximg = link.split("//")[1]
-		ximg = ("http://{}".format(ximg))
+		try:
+			number, ximg, image = await self.comics.get()
+		except ComicError as e:
+			raise exceptions.CommandError("Couldn't get a comic right now: {}.".format(e), expire_in=20)
 
 		await self.safe_send_message(channel, "Comic #: [{}/{}]".format(number, 4751))
-		with urlopen(ximg) as URL:
-			with open('cyanide.jpg', 'wb') as f:
-				f.write(URL.read())
-				await discord.Client.send_file(self, channel, self.dirname + '\\cyanide.jpg')
-				f.close()
-				os.remove('cyanide.jpg')
+		if image:
+			with image:
+				await self.send_file(channel, image, filename='cyanide.jpg')
+		else:
+			await self.send_remote_file(channel, ximg, filename='cyanide.jpg')
 
 ############################## GIPHY API ##############################################################
 
@@ -2754,58 +2905,28 @@ class MusicBot(discord.Client):
 		Searches gifs from giphy and sends the first result.
 		Sends random trending if no parameters are given.
 		'''
-		import requests
-		from urllib.request import urlopen
-		import json
-
 		wait_message = await self.safe_send_message(channel, "Attempting to download the highest quality GIF from GIPHY...\n"
 															 "This might take a bit depending on how big the gif is.")
-		# such fucking spaghetti code
-
-		async def sendgif(parameter, withparameter, withoutparameter):
-			if parameter:
-				parameter = ' '.join([parameter, *leftover_args])
-				r = requests.get("https://api.giphy.com/v1/gifs/search?api_key={}&q={}&limit=1&offset=0&rating=G&lang"
-								 "=en".format(GIPHY_API_KEY, parameter))
-				rjson = json.loads(r.text)
-
-				self.giphyurl = rjson['data'][0]['images'][withparameter]['url']
-			else:
-				no_param = await self.safe_send_message(channel, "No search parameter provided, sending random gif.")
-				r = requests.get("https://api.giphy.com/v1/gifs/random?api_key={}&tag=&rating=R".format(GIPHY_API_KEY))
-				rjson = json.loads(r.text)
-
-				for k, v in rjson['data'].items():
-					if k == withoutparameter:
-						self.giphyurl = v
 
-			with urlopen(self.giphyurl) as URL:
-				with open('giphy.gif', 'wb') as f:
-					f.write(URL.read())
-					await discord.Client.send_file(self, channel, self.dirname + "\\giphy.gif")
-					f.close()
-					os.remove('giphy.gif')
+		if parameter:
+			gif_url = await self.giphy.search(' '.join([parameter, *leftover_args]))
+		else:
+			no_param = await self.safe_send_message(channel, "No search parameter provided, sending random gif.")
+			gif_url = await self.giphy.random()
+			await self.safe_delete_message(no_param)
 
-			try:
-				await self.safe_delete_message(no_param)
-			except UnboundLocalError: # bad practice passing exceptions but in this case it doesn't really matter
-				pass
+		if not gif_url:
 			await self.safe_delete_message(wait_message)
-		try:
-			await sendgif(parameter, 'original', 'image_original_url')
+			return Response("Couldn't find a gif small enough to send, bummer.", delete_after=20)
 
-		except discord.errors.HTTPException:  # file too big
-			compress = await self.safe_send_message(channel, "I found a gif but it was too big to send, trying to "
-															 "compress it.")
+		try:
+			await self.send_remote_file(channel, gif_url, filename='giphy.gif')
+		except (discord.errors.HTTPException, DownloadTooLarge):  # the size giphy reported was off
+			await self.safe_send_message(channel, "Either something is wrong with Discord or this gif is"
+												  " still too large to send, bummer.")
+		finally:
 			await self.safe_delete_message(wait_message)
-			try:
-				await sendgif(parameter, 'downsized_medium', 'fixed_width_small_url')
-				await self.safe_delete_message(compress)
-			except discord.errors.HTTPException: # file STILL too big
-				await self.safe_delete_message(compress)
-				await self.safe_send_message(channel, "Either something is wrong with Discord or even the compressed"
-													  " version of this gif is still too large to send, bummer.")
-				return
+
 	async def cmd_shittybot(self, author, channel):
 		return await self.safe_send_message(channel, "Maybe a little bit but definitely not as much as Mee6")
 
@@ -2901,6 +3022,7 @@ class MusicBot(discord.Client):
 			cur.execute(sql)
 		conn.commit()
 		conn.close()
+		await self.channel_log.compact(server)
 		# checking users
 		"""
 		conn = pymysql.connect(
@@ -2935,6 +3057,40 @@ class MusicBot(discord.Client):
 		"""
 		await self.safe_send_message(channel, "Backed server up successfully! :thumbsup:")
 
+	async def cmd_rewind(self, server, channel, date, leftover_args):
+		"""
+		Usage:
+			{command_prefix}rewind YYYY-MM-DD [HH:MM]
+
+		Rebuilds the channel list as it was at the given time from the channel changelog
+		and lists the channels that no longer exist.
+		"""
+		import datetime
+
+		when = ' '.join([date, *leftover_args])
+		try:
+			if leftover_args:
+				at = datetime.datetime.strptime(when, "%Y-%m-%d %H:%M")
+			else:
+				at = datetime.datetime.strptime(when, "%Y-%m-%d") + datetime.timedelta(days=1)
+		except ValueError:
+			raise exceptions.CommandError("Dates are written as YYYY-MM-DD [HH:MM].", expire_in=20)
+
+		restored = await self.channel_log.restore(server.id, at.timestamp())
+		if restored is None:
+			return Response("Channel history doesn't go back to {}, it starts when the bot first saw this server.".format(when), delete_after=20)
+
+		if not restored:
+			return Response("No channel history recorded up to {}.".format(when), delete_after=20)
+
+		current_channels = set((c.name, str(c.type)) for c in server.channels)
+		missing = ["{} ({})".format(name, ctype) for name, ctype, _ in restored if (name, ctype) not in current_channels]
+
+		if not missing:
+			return Response("No missing channels found since {}.".format(when), delete_after=20)
+
+		return Response("Channels missing since {}:\n```\n{}\n```".format(when, '\n'.join(missing)), delete_after=60)
+
 	async def cmd_date(self, channel):
 		import datetime
 		now = datetime.datetime.now()
@@ -2982,26 +3138,21 @@ class MusicBot(discord.Client):
 			dumptable.append(sub)
 		print(*dumptable)
 
-		rows = [["Number", "Backup Date", "# of Channels"], *dumptable]
-		table = AsciiTable(rows)
-		print(table.table)
-		await self.safe_send_message(channel, "```{}```".format(table.table))
-		await self.safe_send_message(channel, "[Backup]: Dates are shown in ISO 8601 format to avoid confusion YYYY/MM/DD\n[Backup]: Write the number of the backup you wish to select")
+		def render(page_rows):
+			rows = [["Number", "Backup Date", "# of Channels"]]
+			rows += [[number, date, count] for number, (_, date, count) in enumerate(page_rows, 1)]
+			return "```{}```".format(AsciiTable(rows).table)
 
-		response_message = await self.wait_for_message(30, author=author, channel=channel)
-		if not response_message.content.isdigit():
-			return await self.safe_send_message(channel, "[Backup]: You did not enter a valid number.")
+		selected = await Paginator.choose(
+			self, channel, author, dumptable, render=render,
+			header="[Backup]: Dates are shown in ISO 8601 format to avoid confusion YYYY/MM/DD\n"
+				   "[Backup]: Click the number of the backup you wish to select").run()
+
+		if selected is None:
+			return await self.safe_send_message(channel, "[Backup]: No backup was selected.")
 
 		channels_to_restore = {}
-		selected_date = ""
-		for i in dumptable:
-			print(response_message.content)
-			print(i[0])
-			if str(response_message.content) == str(i[0]): #  selected date found
-				print(i[1])
-				selected_date = i[1]
-		if selected_date == "":
-			return await self.safe_send_message(channel, "There was a problem fetching dates from MySQL.")
+		selected_date = dumptable[selected][1]
 		cur = conn.cursor()
 		channel_name_query = "SELECT channel_name, channel_type, position FROM `{}` WHERE date = '{}' ORDER BY position ASC".format(re.escape(server_name), selected_date)
 		cur.execute(channel_name_query)
@@ -3036,6 +3187,10 @@ class MusicBot(discord.Client):
 		print(final)
 		if not final:
 			await self.safe_send_message(channel, "No missing channels found.")
+		else:
+			table = AsciiTable([["Missing Channel", "Type"], *final.items()]).table
+			for page in paginate(['```'] + table.split('\n') + ['```']):
+				await self.safe_send_message(channel, page)
 		#  deleting matching
 		#  for i in server.channels:
 		print(channels_to_restore)
@@ -3050,55 +3205,72 @@ class MusicBot(discord.Client):
 		await self.safe_send_message(channel, "You were banned for using the word 'Nigger'")
 
 	async def cmd_universe(self, channel, leftover_args):
-		import os
-		scriptDir = os.path.dirname(__file__)
+		return await self.cmd_meme(channel, leftover_args, 'brain')
+
+	async def cmd_meme(self, channel, leftover_args, template=None):
+		"""
+		Usage:
+			{command_prefix}meme template caption1, caption2, ...
+
+		Draws the comma separated captions onto a meme template.
+		Leave out the template to list the available ones.
+		"""
+		if not template or template not in self.memes.templates():
+			return Response("Available templates: {}".format(', '.join(self.memes.templates())), delete_after=30)
 
-		args = ' '.join(leftover_args)
-		print(args)
-		newargs = args.split(',')
-		print(newargs)
-		if len(newargs) != 4:
+		newargs = ' '.join(leftover_args).split(',')
+		needed = self.memes.caption_count(template)
+		if len(newargs) != needed:
 			return await self.safe_send_message\
 				(channel,
-				 "This command currently only supports 4"
-				 " frame memes, yours has {} arguments (separate them with commas)".format(len(newargs)))
-		brain = memes.Brain()
-		brain.generate_meme(newargs)
-		brain.settext4(newargs)
-		await discord.Client.send_file(self, channel, scriptDir + '\\meme_folder\\test.jpg')
+				 "The {} meme takes {}"
+				 " captions, yours has {} arguments (separate them with commas)".format(template, needed, len(newargs)))
+
+		with await self.memes.render(template, newargs) as image:
+			await self.send_file(channel, image, filename='{}.jpg'.format(template))
 
 	async def cmd_poll_users(self, channel):
 
-		talking_users = [i.name for i in channel.server.members if i.voice.voice_channel is not None and not i.bot]
-		online_users = [i.name for i in channel.server.members if i.status == discord.Status.online and not i.bot]
-		idle_users = [i.name for i in channel.server.members if i.status == discord.Status.idle and not i.bot]
+		counts = self.presence.counts(channel.server)
 
-		talk = '{} users currently online. (excluding bots)'.format(len(online_users))
-		online = '{} users currently talking. (excluding bots) '.format(len(talking_users))
-		idle = '{} users currently idle. (excluding bots) '.format(len(idle_users))
+		talk = '{} users currently online. (excluding bots)'.format(counts['online'])
+		online = '{} users currently talking. (excluding bots) '.format(counts['voice'])
+		idle = '{} users currently idle. (excluding bots) '.format(counts['idle'])
 
 		await self.safe_send_message(channel, talk + "\n" + idle +'\n'+  online)
 
 	async def whatsapp(self):
-		#import threading
-		#await self.wait_until_ready()
-		#self.thd = ThreadedServer('68.4.235.189', 8080, self)
-		#threading.Thread(target=self.thd.listen).start()
-		pass
+		if self.bridge or not self.config.whatsapp_bridge_port:
+			return
+
+		bridge = BridgeServer('', self.config.whatsapp_bridge_port)
+		bridge.handlers['discord'] = self.fetch_whatsapp_info
+		bridge.handlers['metrics'] = self.fetch_metrics
+
+		try:
+			await bridge.start()
+		except OSError as e:
+			print("[Bridge] Could not listen on port %s: %s" % (self.config.whatsapp_bridge_port, e))
+		else:
+			self.bridge = bridge
 
-	async def fetch_whatsapp_info(self):
+	async def fetch_whatsapp_info(self, request=None):
 		# getting the whatsapp discord server
 		server = self.get_server('356166885294997505')
-		talking_users = [i.name for i in server.members if i.voice.voice_channel is not None and not i.bot]
-		online_users = [i.name for i in server.members if i.status == discord.Status.online and not i.bot]
-		idle_users = [i.name for i in server.members if i.status == discord.Status.idle and not i.bot]
+		if server is None:
+			raise exceptions.CommandError("The bot is not in the WhatsApp discord server")
 
-		talk = '{} users currently online.'.format(len(online_users))
-		online = '{} users currently talking.'.format(len(talking_users))
-		idle = '{} users currently idle.'.format(len(idle_users))
+		counts = self.presence.counts(server)
+
+		talk = '{} users currently online.'.format(counts['online'])
+		online = '{} users currently talking.'.format(counts['voice'])
+		idle = '{} users currently idle.'.format(counts['idle'])
 		total = '{} Information:\n\n{}\n{}\n{}'.format(server.name, online, idle, talk)
 
-		await self.thd.sendDiscordInformation(total)
+		return total
+
+	async def fetch_metrics(self, request=None):
+		return {'presence': self.presence.snapshot(), 'outbound': self.outbound.stats()}
 
 
 if __name__ == '__main__':
@@ -0,0 +1,278 @@
+import time
+import asyncio
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+
+class ChannelChangelog:
+    """
+        Keeps a per-server log of channel deltas (create, delete, rename, move) instead of
+        storing the whole channel list every day.
+
+        Every `compact_every` deltas a full snapshot of the server is written, so restoring a
+        point in time only has to replay the deltas recorded after the closest snapshot.  The first
+        time the bot sees a server its channels are compared with the recorded history and whatever
+        changed while the bot was offline is logged as deltas.  Servers without any history get a
+        snapshot instead, which is where their history starts.
+
+        The database is only ever used from one worker thread, so queries never block the event
+        loop and deltas are written in the order they were recorded.
+    """
+
+    OPS = ('create', 'delete', 'rename', 'move')
+
+    def __init__(self, connect, *, compact_every=100, loop=None):
+        """
+            :param connect: A callable returning a new pymysql connection to the backup database.
+            :param compact_every: Number of deltas after which a server is snapshotted again.
+        """
+        self._connect = connect
+        self._conn = None
+        self.compact_every = compact_every
+        self.loop = loop or asyncio.get_event_loop()
+
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._known_tables = set()
+        self._since_snapshot = defaultdict(int)
+        self._reconciled = set()
+
+    @staticmethod
+    def _log_table(server_id):
+        return 'changelog_%s' % server_id
+
+    @staticmethod
+    def _snapshot_table(server_id):
+        return 'snapshot_%s' % server_id
+
+    def _cursor(self):
+        if self._conn is None or not self._conn.open:
+            self._conn = self._connect()
+        else:
+            # the server drops idle connections, reconnect before the query instead of losing it
+            self._conn.ping(reconnect=True)
+        return self._conn.cursor()
+
+    def _run(self, func, *args):
+        return self.loop.run_in_executor(self._executor, func, *args)
+
+    @staticmethod
+    def _channel_rows(server):
+        return [(c.id, c.name, str(c.type), c.position)
+                for c in server.channels if str(c.type) in ('text', 'voice')]
+
+    def _ensure_tables(self, cur, server_id):
+        if server_id in self._known_tables:
+            return
+
+        cur.execute(
+            "CREATE TABLE IF NOT EXISTS `{}`("
+            "`seq` INT AUTO_INCREMENT PRIMARY KEY, `ts` DOUBLE, `op` VARCHAR(16), `channel_id` VARCHAR(32), "
+            "`channel_name` TEXT, `channel_type` VARCHAR(16), `position` INT, INDEX (`ts`))".format(
+                self._log_table(server_id)))
+
+        cur.execute(
+            "CREATE TABLE IF NOT EXISTS `{}`("
+            "`snapshot_seq` INT, `ts` DOUBLE, `channel_id` VARCHAR(32), "
+            "`channel_name` TEXT, `channel_type` VARCHAR(16), `position` INT, INDEX (`ts`))".format(
+                self._snapshot_table(server_id)))
+
+        self._known_tables.add(server_id)
+
+    def record(self, op, channel):
+        """
+            Queues a single channel delta for the channel's server and returns a future for the write,
+            or None for channels that aren't logged.  A snapshot is taken automatically once enough
+            deltas have piled up.
+        """
+        if op not in self.OPS:
+            raise ValueError("Unknown changelog operation: %s" % op)
+
+        if getattr(channel, 'is_private', False) or str(channel.type) not in ('text', 'voice'):
+            return None
+
+        server = channel.server
+
+        # the channel is read now, it may have changed again by the time the worker gets to it
+        written = self._run(self._write_deltas, server.id, time.time(),
+                            [(op, channel.id, channel.name, str(channel.type), channel.position)])
+
+        self._count_deltas(server, 1)
+        return written
+
+    def _count_deltas(self, server, count):
+        self._since_snapshot[server.id] += count
+        if self._since_snapshot[server.id] >= self.compact_every:
+            self.compact(server)
+
+    def _write_deltas(self, server_id, ts, deltas):
+        try:
+            cur = self._cursor()
+            self._ensure_tables(cur, server_id)
+            cur.executemany(
+                "INSERT INTO `{}`(`ts`, `op`, `channel_id`, `channel_name`, `channel_type`, `position`) "
+                "VALUES (%s, %s, %s, %s, %s, %s)".format(self._log_table(server_id)),
+                [(ts, *delta) for delta in deltas])
+            self._conn.commit()
+
+        except Exception:
+            traceback.print_exc()
+            return False
+
+        return True
+
+    def reconcile(self, server):
+        """
+            Catches the history of a server up with its channels the first time it's seen since the
+            bot started.  Only the channels that changed meanwhile are logged, a snapshot is only
+            written for servers that have no history yet.
+        """
+        if server.id in self._reconciled:
+            return
+
+        self._reconciled.add(server.id)
+
+        future = self._run(self._reconcile, server.id, time.time(), self._channel_rows(server))
+        future.add_done_callback(partial(self._count_reconciled, server))
+
+    def _count_reconciled(self, server, future):
+        if not future.cancelled() and future.exception() is None:
+            self._count_deltas(server, future.result())
+
+    def _reconcile(self, server_id, ts, channels):
+        """
+            Returns the number of deltas written.
+        """
+        try:
+            history = self._replay(server_id, ts)
+        except Exception:
+            traceback.print_exc()
+            return 0
+
+        if history is None:
+            self._write_snapshot(server_id, ts, channels)
+            return 0
+
+        deltas = []
+        live = set()
+
+        for channel_id, name, ctype, position in channels:
+            live.add(channel_id)
+            known = history.get(channel_id)
+
+            if known is None:
+                deltas.append(('create', channel_id, name, ctype, position))
+            elif known[0] != name:
+                deltas.append(('rename', channel_id, name, ctype, position))
+            elif known[2] != position:
+                deltas.append(('move', channel_id, name, ctype, position))
+
+        deltas.extend(('delete', channel_id, name, ctype, position)
+                      for channel_id, (name, ctype, position) in history.items() if channel_id not in live)
+
+        if deltas and self._write_deltas(server_id, ts, deltas):
+            return len(deltas)
+
+        return 0
+
+    def compact(self, server):
+        """
+            Writes a full snapshot of the server's current channels, tagged with the last log sequence
+            number so restores know which deltas are already folded into it.
+            Returns a future that resolves to whether the snapshot was written.
+        """
+        self._since_snapshot[server.id] = 0
+        return self._run(self._write_snapshot, server.id, time.time(), self._channel_rows(server))
+
+    def _write_snapshot(self, server_id, ts, channels):
+        try:
+            cur = self._cursor()
+            self._ensure_tables(cur, server_id)
+
+            cur.execute("SELECT COALESCE(MAX(`seq`), 0) FROM `{}`".format(self._log_table(server_id)))
+            last_seq = cur.fetchone()[0]
+
+            cur.executemany(
+                "INSERT INTO `{}`(`snapshot_seq`, `ts`, `channel_id`, `channel_name`, `channel_type`, `position`) "
+                "VALUES (%s, %s, %s, %s, %s, %s)".format(self._snapshot_table(server_id)),
+                [(last_seq, ts, *row) for row in channels])
+            self._conn.commit()
+
+        except Exception:
+            traceback.print_exc()
+            return False
+
+        return True
+
+    async def restore(self, server_id, at=None):
+        """
+            Rebuilds the channel list of a server as it was at `at` (a unix timestamp, defaults to now).
+
+            Returns a list of (channel_name, channel_type, position) tuples ordered the same way as
+            `MusicBot.ordered_channels`: text channels first, then voice, each sorted by position.
+            Returns None if `at` is before the first snapshot of the server, the deltas alone don't
+            know about channels that were never changed.
+        """
+        if at is None:
+            at = time.time()
+
+        return await self._run(self._restore, server_id, at)
+
+    def _restore(self, server_id, at):
+        channels = self._replay(server_id, at)
+        if channels is None:
+            return None
+
+        text_channels = sorted((c for c in channels.values() if c[1] == 'text'), key=lambda c: c[2])
+        voice_channels = sorted((c for c in channels.values() if c[1] == 'voice'), key=lambda c: c[2])
+
+        return [tuple(c) for c in text_channels + voice_channels]
+
+    def _replay(self, server_id, at):
+        """
+            Returns {channel id: [name, type, position]} as of `at`, or None before the first snapshot.
+        """
+        cur = self._cursor()
+        self._ensure_tables(cur, server_id)
+
+        cur.execute(
+            "SELECT `snapshot_seq`, `ts` FROM `{}` WHERE `ts` <= %s ORDER BY `ts` DESC LIMIT 1".format(
+                self._snapshot_table(server_id)), (at,))
+        found = cur.fetchone()
+
+        if not found:
+            return None
+
+        since_seq, snapshot_ts = found
+        cur.execute(
+            "SELECT `channel_id`, `channel_name`, `channel_type`, `position` FROM `{}` "
+            "WHERE `snapshot_seq` = %s AND `ts` = %s".format(self._snapshot_table(server_id)),
+            (since_seq, snapshot_ts))
+
+        channels = {}
+        for channel_id, name, ctype, position in cur.fetchall():
+            channels[channel_id] = [name, ctype, position]
+
+        cur.execute(
+            "SELECT `op`, `channel_id`, `channel_name`, `channel_type`, `position` FROM `{}` "
+            "WHERE `seq` > %s AND `ts` <= %s ORDER BY `seq` ASC".format(self._log_table(server_id)),
+            (since_seq, at))
+
+        for op, channel_id, name, ctype, position in cur.fetchall():
+            if op == 'delete':
+                channels.pop(channel_id, None)
+            else:
+                channels[channel_id] = [name, ctype, position]
+
+        return channels
+
+    def close(self):
+        """
+            Waits for the queued writes and closes the connection.
+        """
+        self._executor.shutdown(wait=True)
+
+        if self._conn is not None and self._conn.open:
+            self._conn.close()
+        self._conn = None
@@ -0,0 +1,136 @@
+import asyncio
+import random
+import traceback
+
+from .webclient import DownloadError
+
+
+class ComicError(Exception):
+    pass
+
+
+class ComicPool:
+    """
+        Keeps a few random Cyanide and Happiness comics resolved (and downloaded) ahead of time so
+        the comic command can answer straight away.
+
+        Every comic page that has been looked at is remembered: ids that resolved to an image are
+        kept with their image url and ids explosm says don't exist are never requested again.  Pages
+        without a recognisable comic (a layout change, an error page) are only skipped for that pick.
+    """
+
+    comic_url = "http://explosm.net/comics/{}/"
+
+    def __init__(self, web, *, size=3, max_id=4811, attempts=5, prefetch_images=True, loop=None):
+        """
+            :param attempts: Comic pages looked up per pick before giving up with a ComicError
+        """
+        self.web = web
+        self.max_id = max_id
+        self.attempts = attempts
+        self.prefetch_images = prefetch_images
+        self.loop = loop or asyncio.get_event_loop()
+
+        self.known = {}
+        self.missing = set()
+
+        self._pool = asyncio.Queue(maxsize=size)
+        self._worker = None
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._fill(), loop=self.loop)
+
+    def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    async def get(self):
+        """
+            Returns (number, image url, image buffer or None), from the pool if one is ready.
+            Raises ComicError if no comic could be found.
+        """
+        self.start()
+
+        try:
+            return self._pool.get_nowait()
+        except asyncio.QueueEmpty:
+            return await self._resolve_random()
+
+    async def _fill(self):
+        backoff = 30
+
+        while True:
+            try:
+                comic = await self._resolve_random()
+            except asyncio.CancelledError:
+                raise
+            except ComicError as e:
+                print("[Comics] %s, trying again in %ss" % (e, backoff))
+            except Exception:
+                traceback.print_exc()
+            else:
+                backoff = 30
+                await self._pool.put(comic)
+                continue
+
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 600)
+
+    def _pick(self):
+        number = random.randrange(0, self.max_id)
+
+        if number in self.missing:
+            number = random.choice([n for n in range(self.max_id) if n not in self.missing])
+
+        return number
+
+    async def _resolve_random(self):
+        for _ in range(self.attempts):
+            if len(self.missing) >= self.max_id:
+                raise ComicError("None of the %s comics exist" % self.max_id)
+
+            number = self._pick()
+
+            image_url = self.known.get(number)
+            if image_url is None:
+                image_url = await self._resolve(number)
+
+            if image_url is None:
+                continue
+
+            image = None
+            if self.prefetch_images:
+                try:
+                    image = await self.web.download(image_url)
+                except DownloadError:
+                    pass
+
+            return number, image_url, image
+
+        raise ComicError("No comic found in %s tries" % self.attempts)
+
+    async def _resolve(self, number):
+        page = await self.web.get_text(self.comic_url.format(number))
+
+        if page == "Could not find comic":
+            self.missing.add(number)
+            return None
+
+        image_url = await self.loop.run_in_executor(None, self._parse_image_url, page)
+
+        if image_url is not None:
+            self.known[number] = image_url
+
+        return image_url
+
+    @staticmethod
+    def _parse_image_url(page):
+        from bs4 import BeautifulSoup
+
+        img = BeautifulSoup(page, "html.parser").find("img", {"id": "main-comic"})
+        if not img or not img.get('src'):
+            return None
+
+        return "http://{}".format(img['src'].split("//")[-1])
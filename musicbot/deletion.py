@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import asyncio
+import discord
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import partial
+
+from . import outbound
+
+# Bulk deletes are refused for messages older than two weeks, keep some margin
+BULK_MAX_AGE = timedelta(days=14) - timedelta(minutes=10)
+BULK_MAX = 100
+
+# Stands in for discord.Message when reloading saved deletes, delete_message only needs these
+_SavedMessage = namedtuple('_SavedMessage', 'id channel author timestamp')
+
+
+class DeletionService:
+    """
+        Deletes messages for the bot.
+
+        Deletes are collected per channel for `batch_window` seconds and sent as bulk deletes of up to
+        100 messages where the bot is allowed to (bot account with manage messages), otherwise one at a
+        time through the outbound scheduler, which paces them.  Delayed deletes are kept in the bot's
+        TimerHeap, can be cancelled, and are saved on shutdown so a restarted bot still deletes them.
+    """
+
+    def __init__(self, bot, timers, *, batch_window=1.0, loop=None):
+        self.bot = bot
+        self.timers = timers
+        self.batch_window = batch_window
+        self.loop = loop or asyncio.get_event_loop()
+
+        # channel id -> (flush timer, {message id: message})
+        self._pending = {}
+        self._scheduled = {}
+
+    def delete_later(self, message, delay):
+        self.cancel(message)
+        self._scheduled[message.id] = (self.timers.call_later(delay, self._expire, message), message)
+
+    def cancel(self, message):
+        """
+            Drops a scheduled delete, e.g. because the message is already gone.
+        """
+        handle, _ = self._scheduled.pop(message.id, (None, None))
+        if handle is not None:
+            handle.cancel()
+
+    def _expire(self, message):
+        self._scheduled.pop(message.id, None)
+        self.delete(message)
+
+    def delete(self, message):
+        """
+            Queues a message to be deleted with the rest of its channel's batch.
+        """
+        self.cancel(message)
+
+        channel_id = message.channel.id
+
+        if channel_id not in self._pending:
+            self._pending[channel_id] = (self.timers.call_later(self.batch_window, self._flush, channel_id), {})
+
+        _, batch = self._pending[channel_id]
+        batch[message.id] = message
+
+        if len(batch) >= BULK_MAX:
+            self._flush(channel_id)
+
+    def _flush(self, channel_id):
+        timer, batch = self._pending.pop(channel_id, (None, None))
+
+        # flushed early because the batch filled up, the timer would flush the next one too soon
+        if timer is not None:
+            timer.cancel()
+
+        if batch:
+            asyncio.ensure_future(self.delete_many(list(batch.values())), loop=self.loop)
+
+    def save(self, path):
+        """
+            Writes every scheduled or queued delete to `path`, with its due time as a unix timestamp.
+        """
+        now, wall_now = self.loop.time(), time.time()
+
+        entries = [(message, wall_now + handle.when - now) for handle, message in self._scheduled.values()]
+        entries.extend((message, wall_now) for _, batch in self._pending.values() for message in batch.values())
+
+        if not entries:
+            return
+
+        with open(path, 'w', encoding='utf8') as f:
+            json.dump([{
+                'channel': message.channel.id,
+                'message': message.id,
+                'author': message.author.id,
+                'timestamp': (message.timestamp - datetime(1970, 1, 1)).total_seconds(),
+                'due': due
+            } for message, due in entries], f)
+
+    def load(self, path):
+        """
+            Schedules the deletes saved by save() again and removes the file.  Needs the channels
+            to be available, so call it once the bot is ready.
+        """
+        try:
+            with open(path, encoding='utf8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            print("[Deletes] Ignoring unreadable %s" % path)
+            entries = []
+
+        os.remove(path)
+        wall_now = time.time()
+
+        for entry in entries:
+            channel = self.bot.get_channel(entry['channel'])
+            if channel is None:
+                continue
+
+            message = _SavedMessage(entry['message'], channel, discord.Object(entry['author']),
+                                    datetime.utcfromtimestamp(entry['timestamp']))
+            self.delete_later(message, entry['due'] - wall_now)
+
+    def can_bulk_delete(self, channel):
+        return self.bot.user.bot and not channel.is_private and \
+            channel.permissions_for(channel.server.me).manage_messages
+
+    async def delete_many(self, messages):
+        """
+            Deletes messages from a single channel and returns how many were deleted.
+        """
+        if not messages:
+            return 0
+
+        for message in messages:
+            self.cancel(message)
+
+        channel = messages[0].channel
+        singles = list(messages)
+        deleted = 0
+
+        if self.can_bulk_delete(channel):
+            cutoff = datetime.utcnow() - BULK_MAX_AGE
+            recent = [m for m in messages if m.timestamp > cutoff]
+            singles = [m for m in messages if m.timestamp <= cutoff]
+
+            for i in range(0, len(recent), BULK_MAX):
+                chunk = recent[i:i + BULK_MAX]
+
+                if len(chunk) < 2:
+                    singles.extend(chunk)
+                    continue
+
+                try:
+                    await self.bot.outbound.submit(
+                        'delete', channel, partial(self.bot.delete_messages, chunk), priority=outbound.BACKGROUND)
+                    deleted += len(chunk)
+
+                except discord.HTTPException:
+                    singles.extend(chunk)
+
+        delete_others = True
+
+        for message in singles:
+            own = message.author.id == self.bot.user.id
+            if not own and not delete_others:
+                continue
+
+            try:
+                await self.bot.outbound.submit(
+                    'delete', channel, partial(self.bot.delete_message, message),
+                    priority=outbound.BACKGROUND, coalesce_key=message.id)
+                deleted += 1
+
+            except discord.Forbidden:
+                # no permission to delete other people's messages here, don't keep trying
+                if not own:
+                    delete_others = False
+
+            except discord.HTTPException:
+                pass
+
+        return deleted
@@ -0,0 +1,78 @@
+from urllib.parse import quote
+
+from .lib.cache import TTLCache
+from .webclient import DISCORD_UPLOAD_LIMIT
+
+
+class Giphy:
+    """
+        Giphy lookups for the gif command.
+
+        Instead of downloading the original and retrying with a smaller version when the upload
+        fails, the size fields Giphy sends for every rendition are used to pick the biggest gif
+        that fits under the upload limit.  The chosen url is cached per search term.
+    """
+
+    api_url = "https://api.giphy.com/v1/gifs/"
+
+    # gif renditions, the mp4/webp only ones are left out since they don't embed as gifs
+    renditions = ('original', 'downsized_large', 'downsized_medium', 'downsized', 'fixed_height',
+                  'fixed_width', 'fixed_height_small', 'fixed_width_small', 'fixed_height_downsampled',
+                  'fixed_width_downsampled')
+
+    # the random endpoint can still answer with the old flat format, which has no sizes
+    flat_renditions = ('image_original_url', 'fixed_height_downsampled_url', 'fixed_width_small_url')
+
+    def __init__(self, web, api_key, *, size_limit=DISCORD_UPLOAD_LIMIT, cache_ttl=24 * 60 * 60):
+        self.web = web
+        self.api_key = api_key
+        self.size_limit = size_limit
+        self._search_cache = TTLCache(cache_ttl, maxsize=500)
+
+    def pick_rendition(self, gif):
+        """
+            Returns the url of the largest rendition under the size limit, or None if none fit.
+        """
+        images = gif.get('images')
+
+        if not images:
+            return next((gif[key] for key in self.flat_renditions if gif.get(key)), None)
+
+        best_size, best_url = -1, None
+        for name in self.renditions:
+            rendition = images.get(name) or {}
+
+            try:
+                size = int(rendition.get('size', 0))
+            except ValueError:
+                continue
+
+            if rendition.get('url') and best_size < size <= self.size_limit:
+                best_size, best_url = size, rendition['url']
+
+        return best_url
+
+    async def search(self, term):
+        key = ' '.join(term.lower().split())
+        url = self._search_cache.get(key)
+
+        if url is None:
+            response = await self.web.get_json(
+                "{}search?api_key={}&q={}&limit=1&offset=0&rating=G&lang=en".format(self.api_url, self.api_key, quote(term)))
+
+            if not response.get('data'):
+                return None
+
+            url = self.pick_rendition(response['data'][0])
+            if url:
+                self._search_cache.set(key, url)
+
+        return url
+
+    async def random(self):
+        response = await self.web.get_json("{}random?api_key={}&tag=&rating=R".format(self.api_url, self.api_key))
+
+        if not response.get('data'):
+            return None
+
+        return self.pick_rendition(response['data'])
@@ -0,0 +1,96 @@
+import json
+import time
+import asyncio
+import traceback
+
+
+class ImgurError(Exception):
+    pass
+
+
+class _CatalogEntry:
+    __slots__ = ('data', 'etag', 'fetched')
+
+    def __init__(self, data, etag):
+        self.data = data
+        self.etag = etag
+        self.fetched = time.monotonic()
+
+
+class ImgurCatalog:
+    """
+        Caches the album list of the bot's imgur account and the images of each album.
+
+        Fresh entries are served straight from memory.  Once an entry is older than `ttl` it is
+        still served, but a background refresh is started that revalidates it with the ETag
+        imgur gave us, so an unchanged album only costs a 304.
+    """
+
+    api_url = 'https://api.imgur.com/3/'
+
+    def __init__(self, web, client_id, access_token, *, account='DiscordPictureWizard', ttl=5 * 60, loop=None):
+        self.web = web
+        self.account = account
+        self.ttl = ttl
+        self.loop = loop or asyncio.get_event_loop()
+
+        self._client_header = {'authorization': 'Client-ID ' + client_id}
+        self._auth_header = {'authorization': 'Bearer ' + access_token}
+
+        self._entries = {}
+        self._refreshing = {}
+
+    async def albums(self):
+        url = '%saccount/%s/albums/' % (self.api_url, self.account)
+        return await self._get(('albums',), url, self._auth_header)
+
+    async def images(self, album_id):
+        url = '%salbum/%s/images' % (self.api_url, album_id)
+        return await self._get(('images', album_id), url, self._client_header)
+
+    def invalidate(self):
+        self._entries.clear()
+
+    async def _get(self, key, url, headers):
+        entry = self._entries.get(key)
+
+        if entry is None:
+            return await self._fetch(key, url, headers)
+
+        if time.monotonic() - entry.fetched > self.ttl and key not in self._refreshing:
+            self._refreshing[key] = asyncio.ensure_future(self._refresh(key, url, headers), loop=self.loop)
+
+        return entry.data
+
+    async def _refresh(self, key, url, headers):
+        try:
+            await self._fetch(key, url, headers)
+        except Exception:
+            print("[Imgur] Background refresh of %s failed" % url)
+            traceback.print_exc()
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def _fetch(self, key, url, headers):
+        entry = self._entries.get(key)
+
+        if entry and entry.etag:
+            headers = dict(headers, **{'If-None-Match': entry.etag})
+
+        response = await self.web.get(url, headers=headers)
+
+        if response.status == 304 and entry:
+            entry.fetched = time.monotonic()
+            return entry.data
+
+        try:
+            parsed = json.loads(response.body.decode('utf-8'))
+        except ValueError:
+            raise ImgurError("Error accessing Imgur API.")
+
+        if not parsed.get('success'):
+            error = parsed.get('data', {})
+            raise ImgurError(str(error.get('error', error) if isinstance(error, dict) else error))
+
+        self._entries[key] = _CatalogEntry(parsed['data'], response.headers.get('ETag'))
+        return parsed['data']
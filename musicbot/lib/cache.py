@@ -0,0 +1,56 @@
+import time
+
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+        A small dict-like cache where every entry expires `ttl` seconds after it was set.
+        When `maxsize` is given the least recently used entries are evicted first.
+    """
+
+    _missing = object()
+
+    def __init__(self, ttl, *, maxsize=None, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, self._missing) is not self._missing
+
+    def get(self, key, default=None):
+        try:
+            expires, value = self._data[key]
+        except KeyError:
+            return default
+
+        if expires is not None and expires <= self._clock():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, *, ttl=_missing):
+        ttl = self.ttl if ttl is self._missing else ttl
+        expires = self._clock() + ttl if ttl is not None else None
+
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+
+        if self.maxsize is not None:
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        value = self.get(key, self._missing)
+        self._data.pop(key, None)
+        return default if value is self._missing else value
+
+    def clear(self):
+        self._data.clear()
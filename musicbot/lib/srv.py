@@ -1,59 +1,171 @@
-import socket
-import threading
-import pickle
+import json
+import time
+import struct
 import asyncio
+import itertools
 
-class ThreadedServer(object):
-	def __init__(self, host, port, bot):
-		self.bot = bot
-		self.host = socket.gethostname()
+# Every frame is a 4 byte big endian length followed by that many bytes of utf-8 json
+HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 64 * 1024
+
+
+class BridgeError(Exception):
+	pass
+
+
+async def read_frame(reader, max_size=MAX_FRAME_SIZE):
+	"""
+	Reads one frame and returns the decoded json.  Raises asyncio.IncompleteReadError
+	when the connection closes and BridgeError when the frame is too big or not json.
+	"""
+	size, = HEADER.unpack(await reader.readexactly(HEADER.size))
+
+	if size > max_size:
+		raise BridgeError('Frame of {} bytes is over the {} byte limit'.format(size, max_size))
+
+	data = await reader.readexactly(size)
+
+	try:
+		return json.loads(data.decode('utf-8'))
+	except ValueError:
+		raise BridgeError('Frame is not valid json')
+
+
+def write_frame(writer, payload):
+	data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+	writer.write(HEADER.pack(len(data)) + data)
+
+
+class BridgeServer:
+	"""
+	Stream server for the WhatsApp bot, running on the bot's own event loop.
+
+	Clients send requests like {"id": 1, "type": "discord"} and get back
+	{"id": 1, "type": "discord", "data": ...} or {"id": 1, "type": "discord", "error": ...}.
+	`handlers` maps a request type to a coroutine function taking the request.
+	Requests from one client are answered in order, clients are served concurrently.
+	"""
+
+	def __init__(self, host, port, *, max_frame_size=MAX_FRAME_SIZE):
+		self.host = host
 		self.port = port
-		self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-		self.sock.bind((self.host, self.port))
-		print("Initializing Server")
-		self.connection = None
-
-	def listen(self):
-		self.sock.listen(5)
-		while True:
-			client, address = self.sock.accept()
-			print('Got a connection from {}'.format(client))
-			threading.Thread(target=self.listenToClient, args=(client, address)).start()
-
-	def listenToClient(self, client, address):
-		size = 1024
-		while True:
+		self.max_frame_size = max_frame_size
+
+		self.handlers = {}
+		self.clients = {}
+
+		self._ids = itertools.count(1)
+		self._server = None
+
+	@property
+	def sockets(self):
+		return self._server.sockets if self._server else []
+
+	async def start(self):
+		self._server = await asyncio.start_server(self._serve_client, self.host, self.port)
+		print('[Bridge] Listening on {}'.format(', '.join(str(s.getsockname()) for s in self.sockets)))
+
+	def close(self):
+		if self._server is not None:
+			self._server.close()
+			self._server = None
+
+		for writer in self.clients.values():
+			writer.close()
+
+		self.clients.clear()
+
+	async def send(self, client_id, payload):
+		"""
+		Pushes a frame to one client outside of the request/response flow.
+		"""
+		writer = self.clients.get(client_id)
+		if writer is None:
+			raise BridgeError('No client with id {}'.format(client_id))
+
+		write_frame(writer, payload)
+		await writer.drain()
+
+	async def broadcast(self, payload):
+		for client_id in list(self.clients):
 			try:
-				data = client.recv(size)
-				self.connection = client
-				decode = pickle.loads(data)
+				await self.send(client_id, payload)
+			except (BridgeError, ConnectionError):
+				pass
 
-				# Set the response to echo back the recieved data
-				print('Got a request from Whatsapp Bot\n{}'.format(decode))
+	async def _serve_client(self, reader, writer):
+		client_id = next(self._ids)
+		self.clients[client_id] = writer
+		print('[Bridge] Client {} connected from {}'.format(client_id, writer.get_extra_info('peername')))
 
-				if decode == 'discord':
-					self.bot.loop.create_task(self.bot.fetch_whatsapp_info())
+		try:
+			while True:
+				try:
+					request = await read_frame(reader, self.max_frame_size)
+				except asyncio.IncompleteReadError:
+					break
 
+				write_frame(writer, await self._handle(request))
+				await writer.drain()
 
+		except (BridgeError, ConnectionError) as e:
+			print('[Bridge] Dropping client {}: {}'.format(client_id, e))
 
+		finally:
+			self.clients.pop(client_id, None)
+			writer.close()
+			print('[Bridge] Client {} disconnected'.format(client_id))
 
-				else:
-					del self.connection
-					raise Exception('Client disconnected')
-			except:
-				client.close()
-				return False
+	async def _handle(self, request):
+		if not isinstance(request, dict):
+			return {'error': 'Requests must be json objects'}
 
-	async def sendDiscordInformation(self, packet):
-		print('Sending WhatsappBot status information:\n'
-		      '{}'.format(packet))
-		formatted = 'discord\n{}'.format(packet)
-		self.connection.send(pickle.dumps(formatted))
+		response = {'id': request.get('id'), 'type': request.get('type')}
+		handler = self.handlers.get(request.get('type'))
 
+		if handler is None:
+			response['error'] = 'Unknown request type: {}'.format(request.get('type'))
+			return response
 
-if __name__ == '__main__':
+		try:
+			response['data'] = await handler(request)
+		except Exception as e:
+			response['error'] = '{}: {}'.format(type(e).__name__, e)
+
+		return response
+
+
+async def _loopback(clients, requests):
+	"""
+	Starts a server on an ephemeral local port and has `clients` connections
+	push `requests` requests each, checking every response comes back in order.
+	"""
+	async def echo(request):
+		return request['payload']
 
-	thd = ThreadedServer('68.4.235.189', 8080)
-	threading.Thread(target=thd.listen).start()
-	thd.startBot()
+	server = BridgeServer('127.0.0.1', 0)
+	server.handlers['echo'] = echo
+	await server.start()
+	host, port = server.sockets[0].getsockname()[:2]
+
+	async def client(n):
+		reader, writer = await asyncio.open_connection(host, port)
+
+		for i in range(requests):
+			write_frame(writer, {'id': i, 'type': 'echo', 'payload': [n, i]})
+			response = await read_frame(reader)
+			assert response == {'id': i, 'type': 'echo', 'data': [n, i]}, response
+
+		writer.close()
+
+	start = time.perf_counter()
+	await asyncio.gather(*(client(n) for n in range(clients)))
+	elapsed = time.perf_counter() - start
+
+	server.close()
+	print('{} requests over {} clients in {:.2f}s ({:.0f} req/s)'.format(
+		clients * requests, clients, elapsed, clients * requests / elapsed))
+
+
+if __name__ == '__main__':
+	asyncio.get_event_loop().run_until_complete(_loopback(clients=20, requests=500))
@@ -0,0 +1,95 @@
+import heapq
+import asyncio
+import itertools
+import traceback
+
+
+class TimerHandle:
+    __slots__ = ('when', 'callback', 'args', 'cancelled', '_timers')
+
+    def __init__(self, when, callback, args, timers):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self._timers = timers
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self._timers._cancelled += 1
+            self._timers._maybe_compact()
+
+
+class TimerHeap:
+    """
+        Runs callbacks after a delay from a single loop timer, however many are pending.
+        Only the earliest deadline is armed on the loop, the rest wait in a heap.
+
+        Cancelled timers stay in the heap until they come up or until they make up half of it,
+        at which point the heap is rebuilt without them.
+    """
+
+    def __init__(self, *, loop=None):
+        self.loop = loop or asyncio.get_event_loop()
+
+        self._heap = []
+        self._seq = itertools.count()
+        self._cancelled = 0
+        self._armed = None
+        self._armed_at = None
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.loop.time() + max(0, delay), callback, *args)
+
+    def call_at(self, when, callback, *args):
+        """
+            Schedules callback(*args) at loop time `when` and returns a TimerHandle that can cancel it.
+        """
+        handle = TimerHandle(when, callback, args, self)
+        heapq.heappush(self._heap, (when, next(self._seq), handle))
+
+        if self._armed_at is None or when < self._armed_at:
+            self._arm()
+
+        return handle
+
+    def _maybe_compact(self):
+        if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+            self._arm()
+
+    def _arm(self):
+        if self._armed is not None:
+            self._armed.cancel()
+            self._armed = self._armed_at = None
+
+        if self._heap:
+            self._armed_at = self._heap[0][0]
+            self._armed = self.loop.call_at(self._armed_at, self._run)
+
+    def _run(self):
+        self._armed = self._armed_at = None
+        now = self.loop.time()
+
+        while self._heap and self._heap[0][0] <= now:
+            when, seq, handle = heapq.heappop(self._heap)
+
+            if handle.cancelled:
+                self._cancelled -= 1
+                continue
+
+            # so a late cancel() doesn't count it again
+            handle.cancelled = True
+
+            try:
+                handle.callback(*handle.args)
+            except Exception:
+                traceback.print_exc()
+
+        self._arm()
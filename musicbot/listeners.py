@@ -0,0 +1,75 @@
+MESSAGE = 'message'
+REACTION = 'reaction'
+
+
+class ListenerRegistry:
+    """
+        Pending wait_for_message and wait_for_reaction listeners of the bot.
+
+        Listeners are bucketed by (event type, key) where the key is (channel id, author id) for
+        messages and (message id, user id) for reactions, with None standing in for "any".  An event
+        only evaluates the predicates of the (at most four) buckets it could match instead of every
+        pending listener.
+
+        Finished futures (resolved, cancelled or timed out) are dropped whenever their bucket is
+        visited, and the whole registry is swept once it has doubled in size since the last sweep.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._size = 0
+        self._next_sweep = 64
+
+    def __len__(self):
+        return self._size
+
+    def add(self, event_type, key, predicate, future):
+        if self._size >= self._next_sweep:
+            self.sweep()
+
+        self._buckets.setdefault((event_type, key), []).append((predicate, future))
+        self._size += 1
+
+    def sweep(self):
+        for bucket_key, bucket in list(self._buckets.items()):
+            alive = [entry for entry in bucket if not entry[1].done()]
+            self._size -= len(bucket) - len(alive)
+
+            if alive:
+                self._buckets[bucket_key] = alive
+            else:
+                del self._buckets[bucket_key]
+
+        self._next_sweep = max(64, self._size * 2)
+
+    def dispatch(self, event_type, first, second, args, result):
+        """
+            Resolves every listener of the matching buckets whose predicate accepts `args` with `result`.
+        """
+        for key in ((first, second), (first, None), (None, second), (None, None)):
+            bucket = self._buckets.get((event_type, key))
+            if not bucket:
+                continue
+
+            alive = []
+            for condition, future in bucket:
+                if future.done():
+                    continue
+
+                try:
+                    matched = condition(*args)
+                except Exception as e:
+                    # the exception thrown by a check is propagated through the future
+                    future.set_exception(e)
+                else:
+                    if matched:
+                        future.set_result(result)
+                    else:
+                        alive.append((condition, future))
+
+            self._size -= len(bucket) - len(alive)
+
+            if alive:
+                self._buckets[(event_type, key)] = alive
+            else:
+                del self._buckets[(event_type, key)]
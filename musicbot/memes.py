@@ -1,78 +1,181 @@
-from PIL import Image
-from PIL import ImageDraw
-from PIL import ImageFont
-import textwrap
+import io
 import os
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
 scriptDir = os.path.dirname(__file__)
+memeDir = os.path.join(scriptDir, 'meme_folder')
 
-class Meme:
-    def __init__(self, type):
-        # we'll change this as we add support for more memes
-        self.bin = ['brain']
+# Every template is described here instead of getting its own class.
+#   image:     file in meme_folder
+#   font:      file in meme_folder, or a font name Pillow can find on the system
+#   text_size: largest font size, captions are shrunk down to min_text_size until they fit their box
+#   boxes:     one (x, y, width, height) box per caption, in the order the captions are given
+TEMPLATES = {
+    'brain': {
+        'image': 'brain4.jpg',
+        'font': 'arial.ttf',
+        'fill': 'black',
+        'text_size': 50,
+        'min_text_size': 16,
+        'boxes': [(40, 40 + 300 * i, 348, 260) for i in range(4)],
+    },
+}
 
-        if type in self.bin:
-            self.type = type
-        else:
-            raise TypeError("{} is not a valid type".format(type))
+# Per process caches, filled the first time a worker renders a template
+_images = {}
+_fonts = {}
+_glyph_widths = {}
 
-    @staticmethod
-    def get_response(status, action, info):
-        return {"status": status, "action": action, "info": info}
 
-    def generate_meme(self, args):
-        pass
+def _load_image(name):
+    from PIL import Image
 
+    if name not in _images:
+        with Image.open(os.path.join(memeDir, name)) as img:
+            img.load()
+            _images[name] = img.copy()
 
-class Brain(Meme):
-    def __init__(self):
-        super(Brain, self).__init__("brain")
-        self.picture = None
-        self.box1 = {}
-        self.text_size = 50
+    return _images[name]
 
-    def set_picture(self, args):
-        if len(args) != 4:
-            return Meme.get_response(400, "error", "request out of bound")
 
-        self.picture = 'brain{}.jpg'.format(len(args))
-        return Meme.get_response(200, "OK", "")
+def _load_font(name, size):
+    from PIL import ImageFont
 
-    @staticmethod
-    def midpoint(x1, x2):
-        return (x1 + x2) / 2
+    key = (name, size)
+    if key not in _fonts:
+        path = os.path.join(memeDir, name)
+        _fonts[key] = ImageFont.truetype(path if os.path.isfile(path) else name, size)
+
+    return _fonts[key]
+
+
+def _text_width(font_name, size, text):
+    """
+    Sums cached per glyph advances instead of asking Pillow to measure every line.
+    Kerning is ignored, which is close enough for fitting captions.
+    """
+    widths = _glyph_widths.setdefault((font_name, size), {})
+    total = 0
+
+    for char in text:
+        width = widths.get(char)
+        if width is None:
+            font = _load_font(font_name, size)
+            width = widths[char] = font.getlength(char) if hasattr(font, 'getlength') else font.getsize(char)[0]
+        total += width
+
+    return total
+
+
+def _line_height(font_name, size):
+    ascent, descent = _load_font(font_name, size).getmetrics()
+    return ascent + descent
+
+
+def _wrap(font_name, size, text, width):
+    lines = []
+    current = []
+    space = _text_width(font_name, size, ' ')
+    current_width = 0
+
+    for word in text.split():
+        word_width = _text_width(font_name, size, word)
+
+        if current and current_width + space + word_width > width:
+            lines.append(' '.join(current))
+            current, current_width = [], 0
+
+        current_width += word_width + (space if current else 0)
+        current.append(word)
+
+    if current:
+        lines.append(' '.join(current))
 
-    def settext4(self, args):
-        box_size_iter = 300
+    return lines
 
-        # people like leaving spaces after commas
-        cleaned = [x.strip() for x in args]
 
-        img = Image.open(scriptDir +"\\meme_folder\\" + self.picture)
-        draw = ImageDraw.Draw(img)
+@lru_cache(maxsize=1024)
+def layout(font_name, max_size, min_size, width, height, text):
+    """
+    Finds the biggest font size between max_size and min_size at which the text,
+    word wrapped to `width`, fits in `height`.  Returns (size, line height, lines).
+    """
+    size = max_size
 
-        font = ImageFont.truetype("./arial.ttf", self.text_size)
-        margin = offset = 40
+    while True:
+        lines = _wrap(font_name, size, text, width)
+        line_height = _line_height(font_name, size)
 
-        # draw.line(((40, 40), (40, 40 + 900)), fill="red")
-        texts = cleaned
-        start_point = 40
-        for i in texts:
-            text = textwrap.wrap(i, width=12)
-            offset = start_point
-            for line in text:
-                draw.text((margin, offset), line, font=font, fill="black")
-                offset += font.getsize(line)[1]
-            start_point = start_point + box_size_iter
+        fits = len(lines) * line_height <= height and \
+            all(_text_width(font_name, size, line) <= width for line in lines)
 
-        img.save(scriptDir + "\\meme_folder\\test.jpg")
+        if fits or size <= min_size:
+            return size, line_height, tuple(lines)
 
+        size = max(min_size, size - 2)
 
-    def generate_meme(self, args):
+
+def render(template_name, captions):
+    """
+    Draws the captions onto a template and returns the encoded jpeg.
+    Runs inside the process pool, so it only takes and returns plain data.
+    """
+    from PIL import ImageDraw
+
+    template = TEMPLATES[template_name]
+
+    img = _load_image(template['image']).copy()
+    draw = ImageDraw.Draw(img)
+
+    for caption, (x, y, width, height) in zip(captions, template['boxes']):
+        size, line_height, lines = layout(
+            template['font'], template['text_size'], template['min_text_size'], width, height, caption.strip())
+        font = _load_font(template['font'], size)
+
+        for i, line in enumerate(lines):
+            draw.text((x, y + i * line_height), line, font=font, fill=template['fill'])
+
+    out = io.BytesIO()
+    img.save(out, format='JPEG')
+    return out.getvalue()
+
+
+class MemeEngine:
+    """
+    Renders memes in a process pool so Pillow never runs on the event loop.
+    Each worker keeps its templates and fonts loaded between renders.
+    """
+
+    def __init__(self, loop, *, workers=2):
+        self.loop = loop
+        self.workers = workers
+        self._pool = None
+
+    @staticmethod
+    def templates():
+        return sorted(TEMPLATES)
+
+    @staticmethod
+    def caption_count(template_name):
+        return len(TEMPLATES[template_name]['boxes'])
+
+    async def render(self, template_name, captions):
         """
-        :param args: array
-        :return:
+        :param template_name: A key of TEMPLATES
+        :param captions: One string per box of the template
+        :return: BytesIO with the rendered jpeg
         """
-        if self.type != 'brain':
-            return Meme.get_response(404, "error", "invalid type")
+        if template_name not in TEMPLATES:
+            raise KeyError("{} is not a valid meme template".format(template_name))
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+        data = await self.loop.run_in_executor(self._pool, render, template_name, list(captions))
+        return io.BytesIO(data)
 
-        return self.set_picture(args)
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
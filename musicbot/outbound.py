@@ -0,0 +1,220 @@
+import heapq
+import asyncio
+import itertools
+import discord
+
+from collections import deque
+
+# Priority classes, lower goes first
+REPLY = 0
+BACKGROUND = 1
+COSMETIC = 2
+
+# (requests, seconds) allowed per channel for each kind of request
+DEFAULT_LIMITS = {
+    'send': (5, 5.0),
+    'edit': (5, 5.0),
+    'delete': (5, 1.0),
+    'react': (1, 0.25),
+}
+
+
+class _TokenBucket:
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, capacity, per, now):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0
+
+    def delay(self, now):
+        """
+            Seconds until a token is available, 0 if one is available right now.
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def until_full(self, now):
+        """
+            Seconds until the bucket is unblocked and back to capacity, after which it is no different
+            from a new one.
+        """
+        wait = max(0, self.blocked_until - now)
+        tokens = min(self.capacity, self.tokens + (now + wait - self.updated) * self.rate)
+        return wait + (self.capacity - tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, until):
+        self.tokens = 0
+        self.blocked_until = max(self.blocked_until, until)
+
+
+class _Job:
+    __slots__ = ('factory', 'futures', 'key', 'queued')
+
+    def __init__(self, factory, key, queued):
+        self.factory = factory
+        self.futures = []
+        self.key = key
+        self.queued = queued
+
+
+class _Route:
+    __slots__ = ('bucket', 'queue', 'keyed', 'worker')
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.queue = []
+        self.keyed = {}
+        self.worker = None
+
+
+class OutboundScheduler:
+    """
+        Queues the bot's sends, edits and deletes per (kind, channel) route and runs them as the
+        route's token bucket allows, highest priority first.
+
+        Queued requests with the same `coalesce_key` are merged: the latest request replaces the
+        earlier one and every caller gets the result of the one that actually ran.  This is what
+        keeps animations like the coin flip from piling edits onto a busy channel.
+
+        A route is dropped once its queue is empty and its bucket has refilled, so channels that
+        were only written to once (DMs, log channels) don't stay around.
+    """
+
+    def __init__(self, *, loop=None, limits=None, latency_samples=500):
+        self.loop = loop or asyncio.get_event_loop()
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+
+        self._routes = {}
+        self._seq = itertools.count()
+
+        self.sent = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self._latencies = deque(maxlen=latency_samples)
+        self._max_latency = 0
+
+    def submit(self, kind, channel, factory, *, priority=REPLY, coalesce_key=None):
+        """
+            Schedules `factory()` (a coroutine function) on the route of `channel`.
+            Returns a future with its result.
+        """
+        route_key = (kind, getattr(channel, 'id', channel))
+        route = self._routes.get(route_key)
+
+        if route is None:
+            capacity, per = self.limits[kind]
+            route = self._routes[route_key] = _Route(_TokenBucket(capacity, per, self.loop.time()))
+
+        future = self.loop.create_future()
+        job = route.keyed.get(coalesce_key) if coalesce_key is not None else None
+
+        if job is not None:
+            job.factory = factory
+            self.coalesced += 1
+        else:
+            job = _Job(factory, coalesce_key, self.loop.time())
+            heapq.heappush(route.queue, (priority, next(self._seq), job))
+
+            if coalesce_key is not None:
+                route.keyed[coalesce_key] = job
+
+        job.futures.append(future)
+
+        if route.worker is None:
+            route.worker = asyncio.ensure_future(self._drain(route_key, route), loop=self.loop)
+
+        return future
+
+    async def _drain(self, route_key, route):
+        try:
+            while True:
+                if not route.queue:
+                    await asyncio.sleep(route.bucket.until_full(self.loop.time()))
+
+                    if not route.queue:
+                        del self._routes[route_key]
+                        break
+
+                    continue
+
+                wait = route.bucket.delay(self.loop.time())
+                if wait:
+                    await asyncio.sleep(wait)
+                    continue
+
+                priority, seq, job = heapq.heappop(route.queue)
+
+                if job.key is not None:
+                    route.keyed.pop(job.key, None)
+
+                # everyone waiting on it gave up
+                if all(f.done() for f in job.futures):
+                    continue
+
+                route.bucket.take()
+                self._record_latency(self.loop.time() - job.queued)
+
+                try:
+                    result = await job.factory()
+
+                except discord.HTTPException as e:
+                    if getattr(e.response, 'status', None) != 429:
+                        self._resolve(job, exception=e)
+                        continue
+
+                    # discord.py already retried this one, back off for a whole window and try again
+                    self.rate_limited += 1
+                    route.bucket.block(self.loop.time() + self.limits[route_key[0]][1])
+                    heapq.heappush(route.queue, (priority, seq, job))
+
+                    if job.key is not None:
+                        route.keyed.setdefault(job.key, job)
+
+                except Exception as e:
+                    self._resolve(job, exception=e)
+
+                else:
+                    self.sent += 1
+                    self._resolve(job, result=result)
+
+        finally:
+            route.worker = None
+
+    @staticmethod
+    def _resolve(job, *, result=None, exception=None):
+        for future in job.futures:
+            if future.done():
+                continue
+
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+
+    def _record_latency(self, latency):
+        self._latencies.append(latency)
+        self._max_latency = max(self._max_latency, latency)
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+
+        return {
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'rate_limited': self.rate_limited,
+            'queued': sum(len(r.queue) for r in self._routes.values()),
+            'latency_avg': sum(latencies) / len(latencies) if latencies else 0,
+            'latency_p95': latencies[int(len(latencies) * 0.95)] if latencies else 0,
+            'latency_max': self._max_latency,
+        }
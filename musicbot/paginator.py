@@ -0,0 +1,168 @@
+import asyncio
+import discord
+
+from collections.abc import Sequence
+from functools import partial
+
+from . import outbound
+
+PREVIOUS = '\u25c0'
+NEXT = '\u25b6'
+CONFIRM = '\u2705'
+CANCEL = '\u23f9'
+# keycap 1 to 9 and the keycap ten emoji
+NUMBERS = ['{}\u20e3'.format(i) for i in range(1, 10)] + ['\U0001f51f']
+
+
+class LazyPages(Sequence):
+    """
+        Pages rendered only when they are shown, by `render(index)`.
+    """
+
+    def __init__(self, count, render):
+        self.count = count
+        self.render = render
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+
+        return self.render(index)
+
+
+class Paginator:
+    """
+        An interactive menu that lives in a single message.
+
+        Pages are flipped by editing that message when the author clicks the arrow reactions, and
+        choices are made with the other reactions.  There is only ever one reaction listener waiting
+        per menu, and the message is deleted once something is picked, the menu is cancelled or
+        nobody reacted for `timeout` seconds.
+    """
+
+    def __init__(self, bot, channel, author, pages, *, choices=None, confirm=False, page_footer=True, timeout=30):
+        """
+            :param pages: The text of every page, a LazyPages for pages that are expensive to build
+            :param choices: How many numbered choices each page has (at most 10), run() then returns the
+                            picked choice counted over all pages
+            :param confirm: Adds a confirm button, run() then returns the page it was clicked on
+            :param page_footer: Adds "Page x/y" under pages that don't say so themselves
+        """
+        self.bot = bot
+        self.channel = channel
+        self.author = author
+        self.pages = pages
+        self.choices = choices or []
+        self.confirm = confirm
+        self.page_footer = page_footer
+        self.timeout = timeout
+
+        self.page = 0
+        self.message = None
+
+    @classmethod
+    def choose(cls, bot, channel, author, items, *, header='', per_page=5, render=None, timeout=30):
+        """
+            Builds a menu that lists `items` with numbered reactions to pick one of them.
+            `render(page_items)` can replace the default numbered lines of a page, the reactions
+            number the items of each page from 1.
+        """
+        per_page = min(per_page, len(NUMBERS))
+        chunks = [items[i:i + per_page] for i in range(0, len(items), per_page)] or [[]]
+
+        if render is None:
+            def render(page_items):
+                return '\n'.join('{} {}'.format(NUMBERS[i], item) for i, item in enumerate(page_items))
+
+        pages = ['{}\n\n{}'.format(header, render(chunk)).strip() for chunk in chunks]
+        return cls(bot, channel, author, pages, choices=[len(chunk) for chunk in chunks], timeout=timeout)
+
+    def _buttons(self):
+        buttons = []
+
+        if len(self.pages) > 1:
+            buttons += [PREVIOUS, NEXT]
+
+        if self.choices:
+            buttons += NUMBERS[:max(self.choices)]
+
+        if self.confirm:
+            buttons.append(CONFIRM)
+
+        return buttons + [CANCEL]
+
+    def _render(self):
+        text = self.pages[self.page]
+
+        if self.page_footer and len(self.pages) > 1:
+            text += '\n\n*Page {}/{}*'.format(self.page + 1, len(self.pages))
+
+        return text
+
+    async def _react(self, emoji, member=None):
+        if member is None:
+            factory = partial(self.bot.add_reaction, self.message, emoji)
+        else:
+            factory = partial(self.bot.remove_reaction, self.message, emoji, member)
+
+        try:
+            await self.bot.outbound.submit('react', self.channel, factory, priority=outbound.REPLY)
+        except discord.HTTPException:
+            pass
+
+    async def _add_buttons(self, buttons):
+        for emoji in buttons:
+            await self._react(emoji)
+
+    def _can_remove_reactions(self):
+        return not self.channel.is_private and self.channel.permissions_for(self.channel.server.me).manage_messages
+
+    async def run(self):
+        """
+            Shows the menu and returns the selection, or None if it was cancelled or timed out.
+        """
+        self.message = await self.bot.safe_send_message(self.channel, self._render())
+        if not self.message:
+            return None
+
+        buttons = self._buttons()
+
+        # reactions clicked while the rest are still being added count as well
+        adding = asyncio.ensure_future(self._add_buttons(buttons))
+
+        try:
+            while True:
+                result = await self.bot.wait_for_reaction(
+                    buttons, user=self.author, message=self.message, timeout=self.timeout)
+
+                if result is None:
+                    return None
+
+                emoji = result.reaction.emoji
+
+                if emoji == CANCEL:
+                    return None
+
+                if emoji == CONFIRM:
+                    return self.page
+
+                if emoji in (PREVIOUS, NEXT):
+                    self.page = (self.page + (1 if emoji == NEXT else -1)) % len(self.pages)
+                    await self.bot.safe_edit_message(self.message, self._render(), priority=outbound.REPLY)
+
+                    # lets the arrow be clicked again straight away
+                    if self._can_remove_reactions():
+                        asyncio.ensure_future(self._react(emoji, result.user))
+
+                    continue
+
+                choice = NUMBERS.index(emoji)
+                if choice < self.choices[self.page]:
+                    return sum(self.choices[:self.page]) + choice
+
+        finally:
+            adding.cancel()
+            await self.bot.safe_delete_message(self.message, quiet=True)
@@ -25,6 +25,7 @@ class PermissionsDefaults:
 class Permissions:
     def __init__(self, config_file, grant_all=None):
         self.config_file = config_file
+        self.grant_all = grant_all
         self.config = configparser.ConfigParser(interpolation=None)
 
         if not self.config.read(config_file, encoding='utf-8'):
@@ -38,20 +39,40 @@ class Permissions:
                 traceback.print_exc()
                 raise RuntimeError("Unable to copy config/example_permissions.ini to %s: %s" % (config_file, e))
 
-        self.default_group = PermissionGroup('Default', self.config['Default'])
-        self.groups = set()
+        self._load_groups()
 
-        for section in self.config.sections():
-            self.groups.add(PermissionGroup(section, self.config[section]))
+    def _load_groups(self):
+        self.default_group = PermissionGroup('Default', self.config['Default'])
 
         # Create a fake section to fallback onto the permissive default values to grant to the owner
         # noinspection PyTypeChecker
         owner_group = PermissionGroup("Owner (auto)", configparser.SectionProxy(self.config, None))
-        if hasattr(grant_all, '__iter__'):
-            owner_group.user_list = set(grant_all)
+        if hasattr(self.grant_all, '__iter__'):
+            owner_group.user_list = set(self.grant_all)
+
+        # Groups are kept in priority order: the owner first, then sections in the order they appear in the file
+        self.groups = [owner_group]
+
+        for section in self.config.sections():
+            self.groups.append(PermissionGroup(section, self.config[section]))
 
-        self.groups.add(owner_group)
+        self.rebuild_index()
 
+    def rebuild_index(self):
+        """
+        Rebuilds the user id -> group and role id -> group lookups.
+        Must be called after a group's user_list or granted_to_roles is changed.
+        """
+        self._user_index = {}
+        self._role_index = {}
+        self._role_cache = {}
+
+        for priority, group in enumerate(self.groups):
+            for uid in group.user_list:
+                self._user_index.setdefault(uid, group)
+
+            for rid in group.granted_to_roles:
+                self._role_index.setdefault(rid, (priority, group))
 
     def save(self):
         with open(self.config_file, 'w') as f:
@@ -63,25 +84,33 @@ class Permissions:
         :param user: A discord User or Member object
         """
 
-        for group in self.groups:
-            if user.id in group.user_list:
-                return group
+        group = self._user_index.get(user.id)
+        if group:
+            return group
 
         # The only way I could search for roles is if I add a `server=None` param and pass that too
         if type(user) == discord_User:
             return self.default_group
 
-        # We loop again so that we don't return a role based group before we find an assigned one
-        for group in self.groups:
-            for role in user.roles:
-                if role.id in group.granted_to_roles:
-                    return group
+        # A user assigned group always wins over a role based one, so roles are only looked at here
+        role_ids = frozenset(role.id for role in user.roles)
+        key = (user.id, role_ids)
+
+        group = self._role_cache.get(key)
+        if group is None:
+            found = [self._role_index[rid] for rid in role_ids if rid in self._role_index]
+            group = min(found, key=lambda pg: pg[0])[1] if found else self.default_group
+
+            if len(self._role_cache) >= 4096:
+                self._role_cache.clear()
+            self._role_cache[key] = group
 
-        return self.default_group
+        return group
 
     def create_group(self, name, **kwargs):
         self.config.read_dict({name:kwargs})
-        self.groups.add(PermissionGroup(name, self.config[name]))
+        self.groups.append(PermissionGroup(name, self.config[name]))
+        self.rebuild_index()
         # TODO: Test this
 
 
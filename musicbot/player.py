@@ -99,10 +99,21 @@ class MusicPlayer(EventEmitter):
         self._play_lock = asyncio.Lock()
         self._current_player = None
         self._current_entry = None
-        self.state = MusicPlayerState.STOPPED
+        self._state = MusicPlayerState.STOPPED
 
         self.loop.create_task(self.websocket_check())
 
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, value):
+        old, self._state = self._state, value
+
+        if old != value:
+            self.emit('state-changed', player=self, old=old, new=value)
+
     @property
     def volume(self):
         return self._volume
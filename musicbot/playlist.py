@@ -22,14 +22,48 @@ class Playlist(EventEmitter):
         self.downloader = bot.downloader
         self.entries = deque()
 
+        # bumped on every change, along with the total duration of the queued entries
+        self.version = 0
+        self.duration = 0
+
+        # list copy of the entries for paging and the pages rendered from it, both dropped on change
+        self.page_cache = {}
+        self._indexed = None
+
     def __iter__(self):
         return iter(self.entries)
 
+    def _changed(self):
+        self.version += 1
+        self.page_cache.clear()
+        self._indexed = None
+
     def shuffle(self):
         shuffle(self.entries)
+        self._changed()
 
     def clear(self):
         self.entries.clear()
+        self.duration = 0
+        self._changed()
+
+    def remove_entry(self, entry):
+        self.entries.remove(entry)
+        self.duration -= entry.duration
+        self._changed()
+
+    def page(self, number, per_page=10):
+        """
+            Returns the entries on page `number` (counting from 1) and the queue position of the first one.
+        """
+        if self._indexed is None:
+            self._indexed = list(self.entries)
+
+        start = (number - 1) * per_page
+        return self._indexed[start:start + per_page], start + 1
+
+    def page_count(self, per_page=10):
+        return max(1, -(-len(self.entries) // per_page))
 
     async def add_entry(self, song_url, **meta):
         """
@@ -220,6 +254,8 @@ class Playlist(EventEmitter):
 
     def _add_entry(self, entry):
         self.entries.append(entry)
+        self.duration += entry.duration
+        self._changed()
         self.emit('entry-added', playlist=self, entry=entry)
 
         if self.peek() is entry:
@@ -236,6 +272,8 @@ class Playlist(EventEmitter):
             return None
 
         entry = self.entries.popleft()
+        self.duration -= entry.duration
+        self._changed()
 
         if predownload_next:
             next_entry = self.peek()
@@ -0,0 +1,147 @@
+import discord
+
+
+class _ServerPresence:
+    __slots__ = ('online', 'idle', 'voice')
+
+    def __init__(self):
+        self.online = set()
+        self.idle = set()
+        self.voice = set()
+
+
+class PresenceCounters:
+    """
+        Keeps the online, idle and in voice members (bots excluded) of every server as sets of
+        member ids, so the counts can be read without walking the member list.
+
+        The sets are rebuilt from the member list on ready and when joining a server, and after that
+        only the member an event is about gets re-checked.
+    """
+
+    def __init__(self):
+        self._servers = {}
+
+    def rebuild(self, server):
+        presence = self._servers[server.id] = _ServerPresence()
+
+        for member in server.members:
+            self._place(presence, member)
+
+    def rebuild_all(self, servers):
+        self._servers.clear()
+
+        for server in servers:
+            self.rebuild(server)
+
+    def update(self, member):
+        presence = self._servers.get(member.server.id)
+
+        if presence is None:
+            self.rebuild(member.server)
+        else:
+            self._place(presence, member)
+
+    def remove_member(self, member):
+        presence = self._servers.get(member.server.id)
+
+        if presence is not None:
+            presence.online.discard(member.id)
+            presence.idle.discard(member.id)
+            presence.voice.discard(member.id)
+
+    def remove_server(self, server):
+        self._servers.pop(server.id, None)
+
+    def counts(self, server):
+        """
+            Returns {'online': n, 'idle': n, 'voice': n} for the server.
+        """
+        presence = self._servers.get(server.id)
+
+        if presence is None:
+            self.rebuild(server)
+            presence = self._servers[server.id]
+
+        return {'online': len(presence.online), 'idle': len(presence.idle), 'voice': len(presence.voice)}
+
+    def snapshot(self):
+        """
+            The counts of every known server keyed by server id, for metrics.
+        """
+        return {sid: {'online': len(p.online), 'idle': len(p.idle), 'voice': len(p.voice)}
+                for sid, p in self._servers.items()}
+
+    @staticmethod
+    def _place(presence, member):
+        online = idle = voice = False
+
+        if not member.bot:
+            online = member.status == discord.Status.online
+            idle = member.status == discord.Status.idle
+            voice = member.voice.voice_channel is not None
+
+        for members, present in ((presence.online, online), (presence.idle, idle), (presence.voice, voice)):
+            if present:
+                members.add(member.id)
+            else:
+                members.discard(member.id)
+
+
+class OwnerTracker:
+    """
+        Knows where the bot owner is without searching every server.
+
+        The owner's member object is looked up once per server (a dict lookup, not a member scan)
+        and then kept current from member and voice state events, along with the member that is
+        in a voice channel, if any.
+    """
+
+    def __init__(self, owner_id):
+        self.owner_id = owner_id
+
+        self._members = {}
+        self._voice = None
+
+    def rebuild(self, servers):
+        self._members.clear()
+        self._voice = None
+
+        for server in servers:
+            self.add_server(server)
+
+    def add_server(self, server):
+        member = server.get_member(self.owner_id)
+
+        if member is not None:
+            self.update(member)
+
+    def remove_server(self, server):
+        self._members.pop(server.id, None)
+
+        if self._voice is not None and self._voice.server.id == server.id:
+            self._voice = None
+
+    def update(self, member):
+        if member.id != self.owner_id:
+            return
+
+        self._members[member.server.id] = member
+
+        if member.voice.voice_channel is not None:
+            self._voice = member
+        elif self._voice is not None and self._voice.server.id == member.server.id:
+            self._voice = None
+
+    def remove_member(self, member):
+        if member.id == self.owner_id:
+            self.remove_server(member.server)
+
+    def get(self, voice=False):
+        """
+            Returns the owner's member object, the one in a voice channel if `voice`, or None.
+        """
+        if voice:
+            return self._voice
+
+        return next(iter(self._members.values()), None)
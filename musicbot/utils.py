@@ -44,6 +44,10 @@ def sane_round_int(x):
 def paginate(content, *, length=DISCORD_MSG_CHAR_LIMIT, reserve=0):
     """
     Split up a large string or list of strings into chunks for sending to discord.
+
+    Lines that don't fit start the next chunk and lines longer than a whole chunk are split.
+    A ``` code block that runs over a chunk boundary is closed at the end of the chunk and
+    opened again, with its language, at the start of the next one.
     """
     if type(content) == str:
         contentlist = content.split('\n')
@@ -52,18 +56,43 @@ def paginate(content, *, length=DISCORD_MSG_CHAR_LIMIT, reserve=0):
     else:
         raise ValueError("Content must be str or list, not %s" % type(content))
 
+    limit = length - reserve
     chunks = []
-    currentchunk = ''
+    currentchunk = []
+    size = -1  # no newline before the first line
+    fence = None  # the line that opened the code block we're in
 
     for line in contentlist:
-        if len(currentchunk) + len(line) < length - reserve:
-            currentchunk += line + '\n'
-        else:
-            chunks.append(currentchunk)
-            currentchunk = ''
+        fence_after = fence
+        if line.lstrip().startswith('```') and line.count('```') % 2:
+            fence_after = None if fence else re.match(r'\s*(```\w*)', line).group(1)
+
+        # room for the ``` that closes the block if this chunk has to end inside it
+        closing = len('\n```') if fence_after else 0
+        width = limit - closing - (len(fence) + 1 if fence else 0)
+
+        for start in range(0, max(len(line), 1), width):
+            piece = line[start:start + width]
+
+            if currentchunk and size + 1 + len(piece) + closing > limit:
+                if fence and currentchunk[-1] == fence:
+                    currentchunk.pop()  # nothing in the block yet, just open it in the next chunk
+                elif fence:
+                    currentchunk.append('```')
+
+                if currentchunk:
+                    chunks.append('\n'.join(currentchunk))
+
+                currentchunk = [fence] if fence else []
+                size = len(fence) if fence else -1
+
+            currentchunk.append(piece)
+            size += 1 + len(piece)
+
+        fence = fence_after
 
     if currentchunk:
-        chunks.append(currentchunk)
+        chunks.append('\n'.join(currentchunk))
 
     return chunks
 
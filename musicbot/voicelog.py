@@ -0,0 +1,85 @@
+import asyncio
+import traceback
+import discord
+
+from collections import OrderedDict
+
+from .utils import paginate
+
+
+class VoiceActivityLog:
+    """
+        Posts voice joins, leaves and moves to each server's "logs" channel.
+
+        The logs channel of every server is indexed up front and only looked up again when a channel
+        is created, deleted or renamed.  Lines are queued and sent together every `flush_interval`
+        seconds, so a burst of voice events turns into a message or two instead of one each.
+    """
+
+    def __init__(self, send, timers, *, channel_name='logs', flush_interval=5, loop=None):
+        self.send = send
+        self.timers = timers
+        self.channel_name = channel_name
+        self.flush_interval = flush_interval
+        self.loop = loop or asyncio.get_event_loop()
+
+        self._channels = {}
+        self._pending = OrderedDict()
+        self._flusher = None
+
+    def index(self, server):
+        self._channels[server.id] = next(
+            (c for c in server.channels if c.name == self.channel_name and c.type == discord.ChannelType.text), None)
+
+    def index_all(self, servers):
+        self._channels.clear()
+
+        for server in servers:
+            self.index(server)
+
+    def channel_changed(self, channel):
+        """
+            Call on channel create, delete and update.  Only rescans when the logs channel could have changed.
+        """
+        if channel.is_private:
+            return
+
+        current = self._channels.get(channel.server.id)
+        if channel.name == self.channel_name or current is None or current.id == channel.id:
+            self.index(channel.server)
+
+    def log(self, server, line):
+        """
+            Queues a line for the server's logs channel.  Returns False if the server has none.
+        """
+        if server.id not in self._channels:
+            self.index(server)
+
+        channel = self._channels[server.id]
+        if channel is None:
+            return False
+
+        self._pending.setdefault(channel.id, (channel, []))[1].append(line)
+
+        if self._flusher is None:
+            self._flusher = self.timers.call_later(self.flush_interval, self._start_flush)
+
+        return True
+
+    def _start_flush(self):
+        self._flusher = None
+        asyncio.ensure_future(self.flush(), loop=self.loop)
+
+    async def flush(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+
+        pending, self._pending = self._pending, OrderedDict()
+
+        for channel, lines in pending.values():
+            for chunk in paginate(['```nginx'] + lines + ['```']):
+                try:
+                    await self.send(channel, chunk)
+                except Exception:
+                    traceback.print_exc()
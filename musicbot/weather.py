@@ -0,0 +1,88 @@
+import asyncio
+
+from datetime import datetime
+from urllib.parse import quote
+
+from .lib.cache import TTLCache
+
+
+class WeatherService:
+    """
+        OpenWeatherMap lookups for the weather command.
+
+        Current conditions and forecasts are cached separately since the forecast changes a lot
+        less often, and both are fetched at the same time.  Once a city name has been resolved,
+        its id is remembered so later lookups go straight to the id endpoints.
+    """
+
+    base_url = "http://api.openweathermap.org/data/2.5/"
+    units = "&units=metric"
+
+    def __init__(self, web, api_key, *, current_ttl=10 * 60, forecast_ttl=60 * 60, loop=None):
+        """
+            :param web: The bot's WebClient.
+            :param api_key: The "&APPID=..." query fragment.
+        """
+        self.web = web
+        self.api_key = api_key
+        self.loop = loop or asyncio.get_event_loop()
+
+        self._current = TTLCache(current_ttl, maxsize=256)
+        self._forecasts = TTLCache(forecast_ttl, maxsize=256)
+        self._city_ids = {}
+
+    @staticmethod
+    def normalize(city):
+        return ' '.join(city.lower().split())
+
+    def _url(self, endpoint, city, city_id):
+        query = 'id=%s' % city_id if city_id else 'q=%s' % quote(city)
+        return '%s%s?%s%s%s' % (self.base_url, endpoint, query, self.units, self.api_key)
+
+    async def lookup(self, city):
+        """
+            Returns (current, forecast) for a city, or (current, None) if the city was not found.
+            `current` is the raw weather response and `forecast` a list of
+            (date, description, temperature) tuples, one per day.
+        """
+        key = self.normalize(city)
+        city_id = self._city_ids.get(key)
+
+        current = self._current.get(key)
+        forecast = self._forecasts.get(key)
+
+        fetches = []
+        if current is None:
+            fetches.append(self.web.get_json(self._url('weather', city, city_id)))
+        if forecast is None:
+            fetches.append(self.web.get_json(self._url('forecast', city, city_id)))
+
+        results = await asyncio.gather(*fetches)
+
+        if current is None:
+            current = results.pop(0)
+            if str(current.get('cod')) != '200':
+                return current, None
+
+            self._city_ids[key] = current['id']
+            self._current.set(key, current)
+
+        if forecast is None:
+            raw = results.pop(0)
+            if str(raw.get('cod')) != '200':
+                return current, []
+
+            forecast = self.daily_forecast(raw)
+            self._forecasts.set(key, forecast)
+
+        return current, forecast
+
+    @staticmethod
+    def daily_forecast(forecast):
+        """
+            The forecast comes in 3 hour steps, so every 8th entry is the same time on the next day.
+        """
+        return [(datetime.fromtimestamp(float(d['dt'])).strftime('%m/%d/%Y'),
+                 d['weather'][0]['description'],
+                 d['main']['temp'])
+                for d in forecast['list'][::8]]
@@ -0,0 +1,190 @@
+import io
+import json
+import time
+import asyncio
+import aiohttp
+
+from collections import defaultdict, namedtuple
+from urllib.parse import urlsplit
+
+
+WebResponse = namedtuple('WebResponse', 'status headers body')
+
+# Discord rejects uploads over 8MB for regular accounts
+DISCORD_UPLOAD_LIMIT = 8 * 1024 * 1024
+
+
+class DownloadError(Exception):
+    pass
+
+
+class DownloadTooLarge(DownloadError):
+    pass
+
+
+class WebClient:
+    """
+        Thin wrapper around the bot's aiohttp session for the third party APIs used by commands
+        (OpenWeatherMap, Imgur, Giphy, explosm).  Requests never block the event loop, are capped
+        per host, time out, and are retried on connection errors and 5xx responses.
+    """
+
+    def __init__(self, session, *, loop, per_host=4, timeout=10, retries=2, backoff=0.5):
+        self.session = session
+        self.loop = loop
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+        self._host_limits = defaultdict(lambda: asyncio.Semaphore(per_host))
+
+    async def get(self, url, *, headers=None, params=None, timeout=None):
+        """
+            Fetches a url and returns a WebResponse with the whole body read.
+            Client errors (4xx) are returned as is, since a few of these APIs put useful json in them.
+        """
+        timeout = timeout or self.timeout
+        host = urlsplit(url).netloc
+
+        for attempt in range(self.retries + 1):
+            try:
+                with await self._host_limits[host]:
+                    with aiohttp.Timeout(timeout):
+                        async with self.session.get(url, headers=headers, params=params) as response:
+                            body = await response.read()
+
+                if response.status < 500 or attempt == self.retries:
+                    return WebResponse(response.status, response.headers, body)
+
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def get_bytes(self, url, **kwargs):
+        return (await self.get(url, **kwargs)).body
+
+    async def get_text(self, url, *, encoding='utf-8', **kwargs):
+        return (await self.get(url, **kwargs)).body.decode(encoding, 'replace')
+
+    async def get_json(self, url, **kwargs):
+        return json.loads(await self.get_text(url, **kwargs))
+
+    async def download(self, url, *, max_size=DISCORD_UPLOAD_LIMIT, chunk_size=64 * 1024, timeout=None):
+        """
+            Streams a response body into an in-memory buffer that can be handed straight to send_file.
+            Raises DownloadTooLarge as soon as the body goes over `max_size` bytes.
+        """
+        timeout = timeout or self.timeout
+        buffer = io.BytesIO()
+
+        with await self._host_limits[urlsplit(url).netloc]:
+            with aiohttp.Timeout(timeout):
+                async with self.session.get(url) as response:
+                    if response.status >= 400:
+                        raise DownloadError("%s returned HTTP %s" % (url, response.status))
+
+                    if int(response.headers.get('Content-Length', 0)) > max_size:
+                        raise DownloadTooLarge("%s is larger than %s bytes" % (url, max_size))
+
+                    while True:
+                        chunk = await response.content.read(chunk_size)
+                        if not chunk:
+                            break
+
+                        buffer.write(chunk)
+                        if buffer.tell() > max_size:
+                            raise DownloadTooLarge("%s is larger than %s bytes" % (url, max_size))
+
+        buffer.seek(0)
+        return buffer
+
+
+async def _slow_api(delay, clients):
+    """
+        Serves every request `delay` seconds late from a local server while `clients` WebClient.get
+        calls wait on it, and checks that the event loop keeps ticking meanwhile.  Then runs a
+        request that gets two 503s before succeeding and one that never gets an answer, to exercise
+        the retry and timeout paths.
+    """
+    loop = asyncio.get_event_loop()
+    hits = defaultdict(int)
+
+    async def handle(reader, writer):
+        path = (await reader.readline()).split()[1].decode()
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+
+        hits[path] += 1
+
+        if path == '/hang':
+            # holds the connection until the client gives up on it
+            await reader.read()
+            writer.close()
+            return
+
+        if path == '/flaky' and hits[path] <= 2:
+            status, body = 503, b'{"error": "unavailable"}'
+        else:
+            await asyncio.sleep(delay if path == '/slow' else 0)
+            status, body = 200, b'{"ok": true}'
+
+        writer.write(b'HTTP/1.1 %d X\r\nContent-Type: application/json\r\nContent-Length: %d\r\n'
+                     b'Connection: close\r\n\r\n%s' % (status, len(body), body))
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    base = 'http://127.0.0.1:%s' % server.sockets[0].getsockname()[1]
+    session = aiohttp.ClientSession(loop=loop)
+
+    lags = []
+
+    async def watch(interval=0.01):
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            lags.append(loop.time() - start - interval)
+
+    watcher = asyncio.ensure_future(watch())
+
+    try:
+        web = WebClient(session, loop=loop, per_host=clients, timeout=delay + 5)
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(web.get(base + '/slow') for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+        assert all(r.status == 200 and json.loads(r.body.decode()) == {'ok': True} for r in responses)
+        assert elapsed < delay * 2, "requests ran one after another (%.2fs)" % elapsed
+        assert max(lags) < 0.1, "event loop stalled for %.0fms" % (max(lags) * 1000)
+        print('{} requests at {}s latency in {:.2f}s, worst loop lag {:.1f}ms over {} ticks'.format(
+            clients, delay, elapsed, max(lags) * 1000, len(lags)))
+
+        web = WebClient(session, loop=loop, retries=2, backoff=0.1)
+        response = await web.get(base + '/flaky')
+        assert response.status == 200 and hits['/flaky'] == 3, (response.status, hits['/flaky'])
+        print('503, 503, 200 retried into a 200 after {} attempts'.format(hits['/flaky']))
+
+        web = WebClient(session, loop=loop, timeout=0.5, retries=1, backoff=0.1)
+        start = time.perf_counter()
+        try:
+            await web.get(base + '/hang')
+        except asyncio.TimeoutError:
+            pass
+        else:
+            raise AssertionError("a request that never got an answer didn't time out")
+
+        assert hits['/hang'] == 2, hits['/hang']
+        print('unanswered request timed out after {} attempts in {:.2f}s'.format(
+            hits['/hang'], time.perf_counter() - start))
+
+    finally:
+        watcher.cancel()
+        session.close()
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == '__main__':
+    asyncio.get_event_loop().run_until_complete(_slow_api(delay=5, clients=20))
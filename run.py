@@ -7,8 +7,6 @@ import sys
 import time
 import traceback
 
-from musicbot.lib.srv import ThreadedServer
-
 
 class GIT(object):
     @classmethod
@@ -163,7 +161,7 @@ def main():
 
         m = None
         try:
-            from musicbot import MusicBot
+            from musicbot.bot import MusicBot
             m = MusicBot()
             print("Connecting...", end='', flush=True)
             m.run()
@@ -228,6 +226,4 @@ if __name__ == '__main__':
     while True:
         main()
 
-        #ThreadedServer('68.4.235.189', 8080).listen()
-
 